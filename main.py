@@ -2,8 +2,10 @@ import uuid
 import uvicorn
 import time
 import json
+import os
 import logging as log
 from typing import List
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse, Response
@@ -11,7 +13,9 @@ from src.app import (
     search_query_extrapolate,
     extract_web_context,
     static_contacts_retrieval,
+    static_probe_events,
 )
+from src.deadline import request_deadline
 from src.model import (
     ApiResponse,
     ErrorResponseModel,
@@ -25,11 +29,58 @@ from src.copilot.question_generation import generate_question
 from src.copilot.query_merge import merge_goal
 from src.lmBasic.titleGenerator import generate_title
 from src.search import Search
-import tracemalloc
-
-tracemalloc.start()
-
-app = FastAPI(title="Margati Probe", version="0.2.0")
+from src.llmClients import start_llm_clients, close_llm_clients, get_llm_stats
+from src.sanitize_query import QUERY_MODEL
+from src.contactRetrieval import CONTACTS_MODEL
+from src.searchClient import close_provider_clients
+from src.searchCache import search_cache
+from src.queryCache import query_cache
+from src.contactCache import contact_cache
+from src.browserPool import browser_pool
+from src.scrapeScheduler import scrape_scheduler
+from src.httpFetcher import http_fetcher, get_fetch_stats
+from src.pageCache import page_cache
+from src.metrics import metrics_payload, METRICS_CONTENT_TYPE
+from src.tracing import start_logging, stop_logging, bind_request_id, logging_stats
+from src.profiling import router as profiling_router
+from src.debugArtifacts import debug_artifacts
+from src.preprocessPool import (
+    start_preprocess_pool,
+    shutdown_preprocess_pool,
+    loop_lag_monitor,
+)
+from src.config import Config
+
+config = Config()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_logging()
+    await query_cache.load()
+    start_preprocess_pool()
+    start_llm_clients([QUERY_MODEL, CONTACTS_MODEL])
+    loop_lag_monitor.start()
+    await browser_pool.start()
+    yield
+    await browser_pool.close()
+    await http_fetcher.close()
+    await close_provider_clients()
+    await close_llm_clients()
+    await loop_lag_monitor.stop()
+    shutdown_preprocess_pool()
+    debug_artifacts.close()
+    stop_logging()
+
+
+app = FastAPI(title="Margati Probe", version="0.2.0", lifespan=lifespan)
+
+if config.get_profiling_enabled():
+    if os.getenv("PROFILING_TOKEN"):
+        app.include_router(profiling_router)
+        log.warning("Profiling endpoints enabled on /admin/profiling/")
+    else:
+        log.error("Profiling endpoints not mounted, PROFILING_TOKEN is not set")
 
 app.add_middleware(
     CORSMiddleware,
@@ -51,23 +102,43 @@ async def read_root():
     return response
 
 
+@app.get("/stats/")
+async def stats() -> JSONResponse:
+    response = {
+        "browser_pool": browser_pool.stats(),
+        "scheduler": scrape_scheduler.stats(),
+        "fetch_tiers": get_fetch_stats(),
+        "page_cache": page_cache.stats(),
+        "event_loop_lag": loop_lag_monitor.report(),
+        "search_cache": search_cache.stats(),
+        "query_cache": query_cache.stats(),
+        "contact_cache": contact_cache.stats(),
+        "llm_clients": get_llm_stats(),
+        "logging": logging_stats(),
+        "debug_artifacts": debug_artifacts.stats(),
+    }
+    return JSONResponse(content=response)
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """
+    Stage latency histograms, LLM call latency, token and cost counters for Prometheus
+    """
+    return Response(content=metrics_payload(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/static/")
 async def staticProbe(
     request: Request,
     prompt: str | None = "",
     location: str | None = "",
     country_code: str | None = "US",
+    deadline: float | None = None,
 ) -> ApiResponse | ErrorResponseModel:
     ID = uuid.uuid4()
     timestamp = time.strftime("%m-%d_%H:%M:%S", time.localtime())
-    file_name = f"logs/s-{timestamp}-{ID}.log"
-    log.basicConfig(
-        filename=file_name,
-        filemode="w",
-        format="%(levelname)s - %(message)s",
-        level=log.INFO,
-    )
-    print(f"\n{file_name}\n")
+    bind_request_id(str(ID))
 
     if prompt is None or not prompt.strip():
         log.error(f"No prompt provided")
@@ -76,14 +147,16 @@ async def staticProbe(
         log.error(f"Location not provided")
         raise HTTPException(status_code=400, detail="location needed!")
 
-    request_context = RequestContext(str(ID), prompt, location, country_code)
+    request_context = RequestContext(
+        str(ID), prompt, location, country_code, deadline=request_deadline(deadline)
+    )
 
     log.info(f"Request: {prompt}, {location}, {country_code}")
     log.info(f"Request from: {request.client.host}")
     log.info(f"Time: {timestamp}")
 
     try:
-        target, query, goal_type = search_query_extrapolate(
+        target, query, goal_type = await search_query_extrapolate(
             request_context=request_context,
         )
         request_context.update_search_param(target, query, goal_type)
@@ -100,9 +173,53 @@ async def staticProbe(
 
     response = await static_contacts_retrieval(request_context, web_context)
 
+    log.info(
+        f"Event loop lag during request: {loop_lag_monitor.report(since=request_context.start_time)}"
+    )
+    log.info(f"Request deadline: {request_context.deadline.report()}")
     return Response(content=response)
 
 
+@app.get("/static/stream/")
+async def staticProbeStream(
+    request: Request,
+    prompt: str | None = "",
+    location: str | None = "",
+    country_code: str | None = "US",
+    deadline: float | None = None,
+) -> StreamingResponse:
+    """
+    Same pipeline as /static/, streamed as NDJSON events (query, context, contact..., done or error)
+    """
+    ID = uuid.uuid4()
+    bind_request_id(str(ID))
+
+    if prompt is None or not prompt.strip():
+        log.error(f"No prompt provided")
+        raise HTTPException(status_code=400, detail="prompt needed!")
+    if location is None or not location.strip():
+        log.error(f"Location not provided")
+        raise HTTPException(status_code=400, detail="location needed!")
+
+    request_context = RequestContext(
+        str(ID), prompt, location, country_code, deadline=request_deadline(deadline)
+    )
+
+    log.info(f"Stream request: {prompt}, {location}, {country_code}")
+    log.info(f"Request from: {request.client.host}")
+
+    async def ndjson_events():
+        try:
+            async for event in static_probe_events(request_context):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            log.error(f"Stream request {ID} failed: {e}")
+            error = {"event": "error", "data": {"id": str(ID), "message": str(e)}}
+            yield json.dumps(error) + "\n"
+
+    return StreamingResponse(ndjson_events(), media_type="application/x-ndjson")
+
+
 @app.post("/static/reverse-yelp/")
 async def reverseSearchYelp(
     request: YelpReverseSearchRequest,
@@ -113,7 +230,7 @@ async def reverseSearchYelp(
     if location is None or not location.strip():
         raise HTTPException(status_code=400, detail="location needed!")
 
-    search = Search.yelp_reverse_search(vendor_name, location)
+    search = await Search.yelp_reverse_search(vendor_name, location)
 
     if search is None or search == {}:
         raise HTTPException(status_code=404, detail="No results found")
@@ -129,19 +246,14 @@ async def title(
     ID = uuid.uuid4()
     timestamp = time.strftime("%Y-%m-%d_%H:%M:%S", time.localtime())
 
-    log.basicConfig(
-        filename=f"logs/title-{ID}.log",
-        filemode="w",
-        format="%(name)s - %(levelname)s - %(message)s",
-        level=log.INFO,
-    )
+    bind_request_id(str(ID))
 
     if goal is None or not goal.strip():
         log.error(f"No goal provided")
         raise HTTPException(status_code=400, detail="goal needed!")
 
     try:
-        response = generate_title(goal)
+        response = await generate_title(goal)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -160,19 +272,14 @@ async def copilot(
     ID = uuid.uuid4()
     timestamp = time.strftime("%Y-%m-%d_%H:%M:%S", time.localtime())
 
-    log.basicConfig(
-        filename=f"logs/cp-{ID}.log",
-        filemode="w",
-        format="%(name)s - %(levelname)s - %(message)s",
-        level=log.INFO,
-    )
+    bind_request_id(str(ID))
 
     if prompt is None or not prompt.strip():
         log.error(f"No prompt provided")
         raise HTTPException(status_code=400, detail="prompt needed!")
 
     try:
-        response = generate_question(prompt, location)
+        response = await generate_question(prompt, location)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -183,10 +290,10 @@ async def copilot(
 
 
 @app.post("/copilot/merge/")
-def cpMerge(request: CpMergeRequest) -> CpAPIResponse | ErrorResponseModel:
+async def cpMerge(request: CpMergeRequest) -> CpAPIResponse | ErrorResponseModel:
 
     try:
-        response = merge_goal(request.choices, request.goal)
+        response = await merge_goal(request.choices, request.goal)
     except Exception as e:
         raise HTTPException(
             status_code=500,
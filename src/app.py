@@ -1,18 +1,23 @@
-import os
 import json
 import time
 import logging as log
-from typing import List
+from typing import AsyncIterator, List
 from dotenv import load_dotenv
 
 from src.config import Config
 from src.sanitize_query import generate_search_query
-from src.webScraper import scrape_with_playwright
-from src.data_preprocessing import process_data_docs
+from src.queryCache import query_cache
+from src.webScraper import stream_with_playwright
+from src.data_preprocessing import stream_data_docs
 from src.contactRetrieval import (
     static_retrieval_multifetching,
+    retrieval_multithreading,
 )
 from src.search import Search
+from src.deadline import Deadline
+from src.metrics import timed_stage
+from src.tracing import log_payload
+from src.debugArtifacts import debug_artifacts
 from src.model import RequestContext, Link, getLinkJsonList
 from src.utils import (
     process_results,
@@ -24,7 +29,6 @@ from src.utils import (
 
 load_dotenv()
 
-OPENAI_ENV = os.getenv("OPENAI_API_KEY")
 config = Config()
 
 
@@ -80,7 +84,7 @@ def sanitize_search_results(results: List[Link]) -> List[Link]:
     return processed_results
 
 
-def search_query_extrapolate(request_context: RequestContext):
+async def search_query_extrapolate(request_context: RequestContext):
     """
     Extract the search query from the prompt
 
@@ -89,11 +93,13 @@ def search_query_extrapolate(request_context: RequestContext):
     log.info(f"Prompt: {request_context.prompt}")
     goal_target = []
     try:
-        goal_query = generate_search_query(
-            request_context.prompt,
-            location=request_context.location,
-            open_api_key=OPENAI_ENV,
-        )
+        goal_query = await query_cache.get(request_context.prompt, request_context.location)
+        if goal_query is None:
+            goal_query = await generate_search_query(
+                request_context.prompt,
+                location=request_context.location,
+            )
+            await query_cache.set(request_context.prompt, request_context.location, goal_query)
         search_query = goal_query["queries"]
         goal_target = goal_query["targets"]
         goal_type = goal_query["type"]
@@ -129,7 +135,7 @@ async def extract_web_context(
         gmaps_query=request_context.gmaps_query,
         location=request_context.location,
         country_code=request_context.country_code,
-        timeout=15,
+        deadline=request_context.deadline,
         yelp_search=False,
     )
 
@@ -147,18 +153,25 @@ async def extract_web_context(
     # ranking and filtering
     refined_search_results = rank_weblinks(search_results)
 
-    # scrape the websites
-    extracted_content = await scrape_with_playwright(refined_search_results)
-    log.info(f"\nScraped Content: {len(extracted_content)}\n")
+    # scrape the websites, stops once enough contact chunks are collected
+    target_chunks = config.get_target_context_chunks()
+    context_data, _site_contact_links, unused_data, scraped_count = (
+        await stream_data_docs(
+            stream_with_playwright(refined_search_results),
+            config.get_primary_context_size(),
+            max_chunks=target_chunks,
+            deadline=request_context.deadline,
+        )
+    )
+    log.info(f"\nScraped Content: {scraped_count}\n")
 
-    if len(extracted_content) == 0:
+    if scraped_count == 0:
+        if request_context.has_more():
+            log.error("No content extracted before the deadline")
+            return []
         log.error("No content extracted")
         raise Exception("No web content extracted!")
 
-    # Preprocess the extracted content
-    context_data, _site_contact_links, unused_data = process_data_docs(
-        extracted_content, config.get_primary_context_size()
-    )
     log.info(f"\nContext Data len: {len(context_data)}\n")
 
     if request_context.isProduct:
@@ -180,11 +193,16 @@ async def extract_web_context(
         # )
 
         rank_common_secondary_links = rank_weblinks(
-            sanitized_secondary_results, start_rank=len(refined_search_results)
+            sanitized_secondary_results, start_rank=len(refined_search_results) + 1
         )
-        if len(rank_common_secondary_links) > 0:
+        remaining_chunks = target_chunks - len(context_data)
+        if remaining_chunks <= 0:
+            log.info("Primary context already fills the LLM calls, skipping secondary scrape\n")
+        elif len(rank_common_secondary_links) > 0:
             secondary_context_data = await secondary_search(
-                rank_common_secondary_links
+                rank_common_secondary_links,
+                max_chunks=remaining_chunks,
+                deadline=request_context.deadline,
             )
             context_data.extend(secondary_context_data)
             log.info(f"\nTotal Context Data len: {len(context_data)}\n")
@@ -202,18 +220,27 @@ async def extract_web_context(
 
 
 # FIXME : how does it decide the source of the data?
-async def secondary_search(web_links: List[str]):
-    extracted_content = await scrape_with_playwright(web_links)
-    log.info(f"\nSecondary Scraped Content: {len(extracted_content)}\n")
+async def secondary_search(
+    web_links: List[str], max_chunks: int = 25, deadline: Deadline | None = None
+):
+    context_data, site_contact_links, unused_docs, scraped_count = (
+        await stream_data_docs(
+            stream_with_playwright(web_links),
+            config.get_secondary_context_size(),
+            max_chunks=max_chunks,
+            deadline=deadline,
+            stage="secondary_scrape",
+        )
+    )
+    log.info(f"\nSecondary Scraped Content: {scraped_count}\n")
 
-    if len(extracted_content) == 0:
+    if scraped_count == 0 and deadline is not None and deadline.has_more:
+        log.error("No secondary content extracted before the deadline")
+        return []
+    if scraped_count == 0:
         log.error("No content extracted")
         raise Exception("No web content extracted!")
 
-    # Preprocess the extracted content
-    context_data, site_contact_links, unused_docs = process_data_docs(
-        extracted_content, config.get_secondary_context_size()
-    )
     log.info(f"\nSecondary Context Data len: {len(context_data)}\n")
 
     return context_data
@@ -231,10 +258,9 @@ async def static_contacts_retrieval(
         data,
         request_context.prompt,
         request_context.targets,
-        OPENAI_ENV,
-        context_chunk_size=config.get_content_per_llm_call(),
         max_thread=config.get_max_llm_calls(),
-        timeout=10,
+        country_code=request_context.country_code,
+        deadline=request_context.deadline,
     )
 
     end_time = time.time()
@@ -247,17 +273,78 @@ async def static_contacts_retrieval(
         web_result,
         request_context.targets,
         request_context.web_queries,
-        has_more=False,
+        has_more=request_context.has_more(),
     )
 
-    log.info(f"\nStatic Response: {response}")
-    date = time.strftime("%m-%d_%H:%M:%S", time.localtime())
-    with open(f"response-logs/{date}.json", "w") as f:
-        f.write(str(response))
+    log_payload("Static Response", lambda: response, level=log.INFO)
+    debug_artifacts.dump("response", response)
 
     return response
 
 
+async def stream_contacts_retrieval(
+    request_context: RequestContext, data
+) -> AsyncIterator[dict]:
+    """
+    Yields the processed contacts as each LLM call completes, deduplicated across the calls.
+    The contacts keep the rank of their page, the batches complete out of order
+    """
+    emails_check = set()
+    async for web_result in retrieval_multithreading(
+        data,
+        request_context.prompt,
+        request_context.targets,
+        max_thread=config.get_max_llm_calls(),
+        country_code=request_context.country_code,
+        deadline=request_context.deadline,
+    ):
+        for contact in process_results(web_result, emails_check, sort=False):
+            yield contact
+
+
+async def static_probe_events(request_context: RequestContext) -> AsyncIterator[dict]:
+    """
+    The /static/ pipeline as a stream of events :
+    query (generated search query), context (scraped context chunks), contact (one per contact), done
+    """
+
+    def event(name: str, data: dict) -> dict:
+        return {
+            "event": name,
+            "time": round(time.time() - request_context.start_time, 2),
+            "data": data,
+        }
+
+    target, query, goal_type = await search_query_extrapolate(request_context)
+    request_context.update_search_param(target, query, goal_type)
+    yield event(
+        "query",
+        {
+            "targets": request_context.targets,
+            "search_query": request_context.web_queries,
+            "gmaps_query": request_context.gmaps_query,
+        },
+    )
+
+    web_context = await extract_web_context(request_context, deep_scrape=True)
+    yield event("context", {"chunks": len(web_context)})
+
+    count = 0
+    async for contact in stream_contacts_retrieval(request_context, web_context):
+        count += 1
+        if count == 1:
+            log.info(
+                f"First contact after {time.time() - request_context.start_time:.2f} seconds"
+            )
+        yield event("contact", contact)
+
+    yield event(
+        "done",
+        {"id": request_context.id, "count": count, "has_more": request_context.has_more()},
+    )
+
+
+@timed_stage("format")
 async def response_formatter(
     id: str,
     time,
@@ -282,6 +369,7 @@ async def response_formatter(
         "location": str(location),
         "prompt": str(prompt),
         "count": len(results),
+        "has_more": has_more,
         "results": results,
         "meta": meta,
     }
@@ -0,0 +1,238 @@
+import asyncio
+import time
+import logging as log
+from typing import List
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, Browser, BrowserContext
+
+from src.config import Config
+
+config = Config()
+
+
+class PooledBrowser:
+    def __init__(self, index: int, browser: Browser):
+        self.index = index
+        self.browser = browser
+        self.pages_served = 0
+        self.active_contexts = 0
+        self.launched_at = time.time()
+
+    def is_healthy(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+
+class BrowserPool:
+    """
+    Process-wide pool of headless Chromium browsers that hands out browser contexts.
+
+    - `browser_count` browsers are launched once and shared by every request
+    - at most `contexts_per_browser` contexts are open on a browser at a time
+    - a browser is relaunched after serving `max_pages_per_browser` pages, or when it disconnects
+    """
+
+    def __init__(
+        self,
+        browser_count: int = 2,
+        contexts_per_browser: int = 8,
+        max_pages_per_browser: int = 200,
+        health_check_interval: int = 30,
+        drain_timeout: int = 30,
+    ):
+        self.browser_count = browser_count
+        self.contexts_per_browser = contexts_per_browser
+        self.max_pages_per_browser = max_pages_per_browser
+        self.health_check_interval = health_check_interval
+        self.drain_timeout = drain_timeout
+
+        self._playwright = None
+        self._browsers: List[PooledBrowser] = []
+        self._slots: asyncio.Semaphore | None = None
+        self._lock: asyncio.Lock | None = None
+        self._idle: asyncio.Event | None = None
+        self._health_task: asyncio.Task | None = None
+        self._started = False
+        self._closing = False
+
+    @property
+    def capacity(self) -> int:
+        return self.browser_count * self.contexts_per_browser
+
+    async def start(self):
+        """
+        Launch the browsers, safe to call more than once
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._started:
+                return
+            t_flag1 = time.time()
+            self._closing = False
+            self._slots = asyncio.Semaphore(self.capacity)
+            self._idle = asyncio.Event()
+            self._idle.set()
+            self._playwright = await async_playwright().start()
+            self._browsers = [
+                PooledBrowser(index, await self._launch())
+                for index in range(self.browser_count)
+            ]
+            self._health_task = asyncio.create_task(self._health_loop())
+            self._started = True
+            t_flag2 = time.time()
+            log.info(
+                f"Browser pool started with {self.browser_count} browsers, {self.capacity} contexts in {t_flag2 - t_flag1:.2f} seconds"
+            )
+
+    async def close(self):
+        """
+        Drain the pool, waits for the leased contexts to be returned and closes the browsers
+        """
+        if not self._started:
+            return
+        self._closing = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning(
+                f"Browser pool drain timed out, {self._active_contexts()} contexts still open"
+            )
+
+        for pooled in self._browsers:
+            await self._close_browser(pooled)
+        self._browsers = []
+        try:
+            await self._playwright.stop()
+        except Exception as e:
+            log.error(f"Error stopping playwright: {e}")
+        self._playwright = None
+        self._started = False
+        log.info("Browser pool closed")
+
+    @asynccontextmanager
+    async def context(self):
+        """
+        Lease a fresh browser context from the pool, the context is closed on exit
+        """
+        if not self._started:
+            await self.start()
+        if self._closing:
+            raise RuntimeError("Browser pool is shutting down")
+
+        async with self._slots:
+            pooled = await self._pick_browser()
+            pooled.active_contexts += 1
+            self._idle.clear()
+            browser_context: BrowserContext | None = None
+            try:
+                browser_context = await pooled.browser.new_context()
+                yield browser_context
+            finally:
+                if browser_context is not None:
+                    pooled.pages_served += 1
+                    try:
+                        await browser_context.close()
+                    except Exception as e:
+                        log.error(f"Error closing browser context: {e}")
+                pooled.active_contexts -= 1
+                await self._maybe_recycle(pooled)
+                if self._active_contexts() == 0:
+                    self._idle.set()
+
+    async def health_check(self) -> dict:
+        """
+        Relaunch disconnected browsers and report the pool state
+        """
+        if self._started and not self._closing:
+            async with self._lock:
+                for pooled in self._browsers:
+                    if not pooled.is_healthy() and pooled.active_contexts == 0:
+                        log.warning(f"Browser {pooled.index} is unhealthy, relaunching")
+                        await self._relaunch(pooled)
+        return self.stats()
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.health_check()
+            except Exception as e:
+                log.error(f"Browser pool health check failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "started": self._started,
+            "capacity": self.capacity,
+            "active_contexts": self._active_contexts(),
+            "browsers": [
+                {
+                    "index": pooled.index,
+                    "healthy": pooled.is_healthy(),
+                    "active_contexts": pooled.active_contexts,
+                    "pages_served": pooled.pages_served,
+                    "uptime": int(time.time() - pooled.launched_at),
+                }
+                for pooled in self._browsers
+            ],
+        }
+
+    async def _launch(self) -> Browser:
+        return await self._playwright.chromium.launch(headless=True)
+
+    async def _pick_browser(self) -> PooledBrowser:
+        """
+        Least loaded healthy browser, relaunches a dead browser if no healthy one is left
+        """
+        async with self._lock:
+            healthy = [pooled for pooled in self._browsers if pooled.is_healthy()]
+            if not healthy:
+                pooled = min(self._browsers, key=lambda b: b.active_contexts)
+                log.warning(f"No healthy browser in pool, relaunching {pooled.index}")
+                await self._relaunch(pooled)
+                return pooled
+            # browsers due for recycling are skipped so they can go idle and relaunch
+            fresh = [
+                pooled
+                for pooled in healthy
+                if pooled.pages_served < self.max_pages_per_browser
+            ]
+            return min(fresh or healthy, key=lambda b: b.active_contexts)
+
+    async def _maybe_recycle(self, pooled: PooledBrowser):
+        if self._closing or pooled.active_contexts > 0:
+            return
+        if pooled.pages_served < self.max_pages_per_browser and pooled.is_healthy():
+            return
+        async with self._lock:
+            if pooled.active_contexts > 0:
+                return
+            log.info(
+                f"Recycling browser {pooled.index} after {pooled.pages_served} pages"
+            )
+            await self._relaunch(pooled)
+
+    async def _relaunch(self, pooled: PooledBrowser):
+        await self._close_browser(pooled)
+        pooled.browser = await self._launch()
+        pooled.pages_served = 0
+        pooled.launched_at = time.time()
+
+    async def _close_browser(self, pooled: PooledBrowser):
+        try:
+            if pooled.browser is not None and pooled.browser.is_connected():
+                await pooled.browser.close()
+        except Exception as e:
+            log.error(f"Error closing browser {pooled.index}: {e}")
+
+    def _active_contexts(self) -> int:
+        return sum(pooled.active_contexts for pooled in self._browsers)
+
+
+browser_pool = BrowserPool(
+    browser_count=config.get_browser_pool_size(),
+    contexts_per_browser=config.get_contexts_per_browser(),
+    max_pages_per_browser=config.get_max_pages_per_browser(),
+)
@@ -0,0 +1,147 @@
+import os
+import time
+import json
+import sqlite3
+import logging as log
+from typing import Any
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bounded in-memory mapping, evicts the least recently used key past `maxsize`
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def items(self):
+        return list(self._data.items())
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteKV:
+    """
+    Small persistent key value store (JSON values) shared by the uvicorn workers through SQLite WAL.
+    Keeps at most `max_entries`, dropping the oldest ones
+    """
+
+    def __init__(self, path: str, table: str = "kv", max_entries: int = 100000):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self._ready = False
+        self._writes = 0
+
+    def get(self, key: str) -> tuple[Any, float] | None:
+        """
+        Value and the epoch time it was stored at
+        """
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, stored_at: float | None = None):
+        connection = self._connect()
+        try:
+            connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, separators=(",", ":")), stored_at or time.time()),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._trim(connection)
+        finally:
+            connection.close()
+
+    def delete(self, key: str):
+        connection = self._connect()
+        try:
+            connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        finally:
+            connection.close()
+
+    def clear(self):
+        connection = self._connect()
+        try:
+            connection.execute(f"DELETE FROM {self.table}")
+        finally:
+            connection.close()
+
+    def items(self, limit: int | None = None) -> list:
+        """
+        Newest entries first
+        """
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"SELECT key, value, stored_at FROM {self.table} ORDER BY stored_at DESC LIMIT ?",
+                (limit if limit is not None else -1,),
+            ).fetchall()
+        finally:
+            connection.close()
+        return [(key, json.loads(value), stored_at) for key, value, stored_at in rows]
+
+    def _trim(self, connection: sqlite3.Connection):
+        count = connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        connection.execute(
+            f"DELETE FROM {self.table} WHERE key IN "
+            f"(SELECT key FROM {self.table} ORDER BY stored_at ASC LIMIT ?)",
+            (count - self.max_entries,),
+        )
+        log.info(f"{self.table} store trimmed by {count - self.max_entries} entries")
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        connection.execute("PRAGMA busy_timeout = 10000")
+        if not self._ready:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )"""
+            )
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_stored_at ON {self.table} (stored_at)"
+            )
+            self._ready = True
+        return connection
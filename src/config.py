@@ -31,12 +31,266 @@ class Config:
     def get_max_llm_calls(self):
         return int(self.config["APP_CONFIG"]["MAX_LLM_CALLS"])
 
+    def get_target_context_chunks(self):
+        """
+        Contact chunks after which scraping stops early, defaults to what the LLM calls can take
+        """
+        default = self.get_content_per_llm_call() * self.get_max_llm_calls()
+        return int(self.config["APP_CONFIG"].get("TARGET_CONTEXT_CHUNKS", default))
+
+    def get_llm_prompt_token_budget(self):
+        """
+        Target prompt tokens of a contact retrieval LLM call, the context chunks are packed up to it
+        """
+        return int(self.config["APP_CONFIG"].get("LLM_PROMPT_TOKENS", 2800))
+
+    def get_direct_extraction_enabled(self):
+        return str(self.config["APP_CONFIG"].get("DIRECT_EXTRACTION", "true")) == "true"
+
     def get_web_scraping_timeout(self):
         return int(self.config["APP_CONFIG"]["WEB_SCRAPING_TIMEOUT"])
 
     def get_max_sites_per_query(self):
         return int(self.config["APP_CONFIG"]["MAX_SITES_PER_QUERY"])
 
+    def get_app_profile(self):
+        """
+        "development" or "production", the PROBE_PROFILE env variable overrides the config
+        """
+        return environ.get("PROBE_PROFILE", self.config["APP_CONFIG"].get("PROFILE", "development"))
+
+    # ------------ SCRAPER CONFIG ------------
+
+    def get_browser_pool_size(self):
+        return int(self.config.get("SCRAPER", {}).get("BROWSER_POOL_SIZE", 2))
+
+    def get_contexts_per_browser(self):
+        return int(self.config.get("SCRAPER", {}).get("CONTEXTS_PER_BROWSER", 8))
+
+    def get_max_pages_per_browser(self):
+        return int(self.config.get("SCRAPER", {}).get("MAX_PAGES_PER_BROWSER", 200))
+
+    def get_max_open_pages(self):
+        return int(self.config.get("SCRAPER", {}).get("MAX_OPEN_PAGES", 16))
+
+    def get_per_host_page_limit(self):
+        return int(self.config.get("SCRAPER", {}).get("PER_HOST_PAGE_LIMIT", 2))
+
+    def get_http_fetch_enabled(self):
+        return str(self.config.get("SCRAPER", {}).get("HTTP_FETCH", "true")) == "true"
+
+    def get_http_fetch_timeout(self):
+        return float(self.config.get("SCRAPER", {}).get("HTTP_FETCH_TIMEOUT", 5))
+
+    def get_http_fetch_max_connections(self):
+        return int(self.config.get("SCRAPER", {}).get("HTTP_FETCH_MAX_CONNECTIONS", 100))
+
+    def get_http_fetch_min_text_length(self):
+        return int(self.config.get("SCRAPER", {}).get("HTTP_FETCH_MIN_TEXT_LENGTH", 500))
+
+    def get_html_extractor(self):
+        return self.config.get("SCRAPER", {}).get("HTML_EXTRACTOR", "lxml")
+
+    def get_preprocess_workers(self):
+        return int(self.config.get("SCRAPER", {}).get("PREPROCESS_WORKERS", 2))
+
+    def get_preprocess_max_html_chars(self):
+        return int(
+            self.config.get("SCRAPER", {}).get("PREPROCESS_MAX_HTML_CHARS", 2000000)
+        )
+
+    # ------------ PAGE CACHE CONFIG ------------
+
+    def get_page_cache_enabled(self):
+        return str(self.config.get("PAGE_CACHE", {}).get("ENABLED", "true")) == "true"
+
+    def get_page_cache_path(self):
+        return self.config.get("PAGE_CACHE", {}).get("PATH", "cache/pages.sqlite3")
+
+    def get_page_cache_ttl(self):
+        return int(self.config.get("PAGE_CACHE", {}).get("TTL", 86400))
+
+    def get_page_cache_max_size(self):
+        return int(self.config.get("PAGE_CACHE", {}).get("MAX_SIZE_MB", 256)) * 1024 * 1024
+
+    # ------------ SEARCH CONFIG ------------
+
+    def get_search_timeout(self, provider: str):
+        default_timeouts = {"google": 5, "bing": 5, "gmaps": 8, "yelp": 8}
+        key = f"{provider.upper()}_TIMEOUT"
+        return float(
+            self.config.get("SEARCH", {}).get(key, default_timeouts.get(provider, 5))
+        )
+
+    def get_search_retries(self):
+        return int(self.config.get("SEARCH", {}).get("RETRIES", 2))
+
+    def get_search_backoff(self):
+        return float(self.config.get("SEARCH", {}).get("BACKOFF", 0.3))
+
+    def get_rank_fusion_k(self):
+        return int(self.config.get("SEARCH", {}).get("RRF_K", 60))
+
+    def get_multi_source_boost(self):
+        return float(self.config.get("SEARCH", {}).get("MULTI_SOURCE_BOOST", 0.25))
+
+    def get_maps_rating_boost(self):
+        return float(self.config.get("SEARCH", {}).get("MAPS_RATING_BOOST", 0.2))
+
+    def get_search_cache_ttls(self):
+        search_cache = self.config.get("SEARCH_CACHE", {})
+        return {
+            "google": int(search_cache.get("GOOGLE_TTL", 86400)),
+            "bing": int(search_cache.get("BING_TTL", 86400)),
+            "gmaps": int(search_cache.get("GMAPS_TTL", 43200)),
+        }
+
+    def get_search_cache_stale_window(self):
+        return int(self.config.get("SEARCH_CACHE", {}).get("STALE_WINDOW", 3600))
+
+    def get_search_cache_size(self):
+        return int(self.config.get("SEARCH_CACHE", {}).get("SIZE", 2048))
+
+    def get_search_cache_persist(self):
+        return str(self.config.get("SEARCH_CACHE", {}).get("PERSIST", "false")) == "true"
+
+    def get_search_cache_path(self):
+        return self.config.get("SEARCH_CACHE", {}).get("PATH", "cache/search.sqlite3")
+
+    # ------------ QUERY CACHE CONFIG ------------
+
+    def get_query_cache_ttl(self):
+        return int(self.config.get("QUERY_CACHE", {}).get("TTL", 604800))
+
+    def get_query_cache_size(self):
+        return int(self.config.get("QUERY_CACHE", {}).get("SIZE", 1024))
+
+    def get_query_cache_similarity(self):
+        return str(self.config.get("QUERY_CACHE", {}).get("SIMILARITY", "false")) == "true"
+
+    def get_query_cache_threshold(self):
+        return float(self.config.get("QUERY_CACHE", {}).get("THRESHOLD", 0.8))
+
+    def get_query_cache_persist(self):
+        return str(self.config.get("QUERY_CACHE", {}).get("PERSIST", "false")) == "true"
+
+    def get_query_cache_path(self):
+        return self.config.get("QUERY_CACHE", {}).get("PATH", "cache/queries.sqlite3")
+
+    # ------------ CONTACT CACHE CONFIG ------------
+
+    def get_contact_cache_enabled(self):
+        return str(self.config.get("CONTACT_CACHE", {}).get("ENABLED", "true")) == "true"
+
+    def get_contact_cache_ttl(self):
+        return int(self.config.get("CONTACT_CACHE", {}).get("TTL", 604800))
+
+    def get_contact_cache_size(self):
+        return int(self.config.get("CONTACT_CACHE", {}).get("SIZE", 4096))
+
+    def get_contact_cache_persist(self):
+        return str(self.config.get("CONTACT_CACHE", {}).get("PERSIST", "false")) == "true"
+
+    def get_contact_cache_path(self):
+        return self.config.get("CONTACT_CACHE", {}).get("PATH", "cache/contacts.sqlite3")
+
+    # ------------ LLM CONFIG ------------
+
+    def get_query_llm_timeout(self):
+        return float(self.config.get("LLM", {}).get("QUERY_TIMEOUT", 15))
+
+    def get_llm_timeout(self, model: str):
+        llm = self.config.get("LLM", {})
+        return float(llm.get("MODEL_TIMEOUTS", {}).get(model, llm.get("TIMEOUT", 30)))
+
+    def get_llm_max_concurrency(self, model: str):
+        llm = self.config.get("LLM", {})
+        return int(llm.get("MODEL_CONCURRENCY", {}).get(model, llm.get("MAX_CONCURRENCY", 16)))
+
+    def get_llm_retries(self):
+        return int(self.config.get("LLM", {}).get("RETRIES", 1))
+
+    def get_llm_max_connections(self):
+        return int(self.config.get("LLM", {}).get("MAX_CONNECTIONS", 100))
+
+    def get_llm_http2(self):
+        return str(self.config.get("LLM", {}).get("HTTP2", "true")) == "true"
+
+    # ------------ DEADLINE CONFIG ------------
+
+    def get_request_deadline(self):
+        return float(self.config.get("DEADLINE", {}).get("REQUEST_SECONDS", 45))
+
+    def get_stage_deadlines(self):
+        deadline = self.config.get("DEADLINE", {})
+        return {
+            "search": float(deadline.get("SEARCH_SECONDS", 8)),
+            "scrape": float(deadline.get("SCRAPE_SECONDS", 20)),
+            "secondary_search": float(deadline.get("SECONDARY_SEARCH_SECONDS", 5)),
+            "secondary_scrape": float(deadline.get("SECONDARY_SCRAPE_SECONDS", 10)),
+            "retrieval": float(deadline.get("RETRIEVAL_SECONDS", 15)),
+        }
+
+    def get_llm_reserve_seconds(self):
+        """
+        Seconds of the request deadline kept for the LLM retrieval, the earlier stages stop before
+        """
+        return float(self.config.get("DEADLINE", {}).get("LLM_RESERVE_SECONDS", 8))
+
+    # ------------ DEBUG ARTIFACTS CONFIG ------------
+
+    def get_debug_artifacts_enabled(self):
+        """
+        Debug dumps are never written in the production profile
+        """
+        if self.get_app_profile() == "production":
+            return False
+        return str(self.config.get("DEBUG_ARTIFACTS", {}).get("ENABLED", "true")) == "true"
+
+    def get_debug_artifact_names(self):
+        """
+        Dumps to write, "all" or a list of names
+        """
+        default = [
+            "bing",
+            "google",
+            "google_maps",
+            "yelp",
+            "yelp_processed",
+            "yelp-r",
+            "common_search_results",
+            "secondary_search_results",
+            "response",
+        ]
+        return self.config.get("DEBUG_ARTIFACTS", {}).get("ARTIFACTS", default)
+
+    def get_debug_artifacts_path(self):
+        return self.config.get("DEBUG_ARTIFACTS", {}).get("PATH", "logs/artifacts")
+
+    def get_debug_artifacts_sample_rate(self):
+        return float(self.config.get("DEBUG_ARTIFACTS", {}).get("SAMPLE_RATE", 1.0))
+
+    def get_debug_artifacts_compress(self):
+        return str(self.config.get("DEBUG_ARTIFACTS", {}).get("COMPRESS", "true")) == "true"
+
+    def get_debug_artifacts_max_requests(self):
+        return int(self.config.get("DEBUG_ARTIFACTS", {}).get("MAX_REQUESTS", 200))
+
+    # ------------ PROFILING CONFIG ------------
+
+    def get_profiling_enabled(self):
+        """
+        Mounts the /admin/profiling/ endpoints (tracemalloc snapshots, cProfile of a /static/ request),
+        only with the PROFILING_TOKEN env variable set
+        """
+        return str(self.config.get("PROFILING", {}).get("ENABLED", "false")) == "true"
+
+    def get_tracemalloc_frames(self):
+        return int(self.config.get("PROFILING", {}).get("TRACEMALLOC_FRAMES", 10))
+
+    def get_max_tracemalloc_snapshots(self):
+        return int(self.config.get("PROFILING", {}).get("MAX_SNAPSHOTS", 5))
+
     # ------------ LOG CONFIG ------------
 
     def get_debug_logging(self):
@@ -45,6 +299,27 @@ class Config:
     def get_logging(self):
         return self.config["LOGGING"]["LOGGING"] == "true"
 
+    def get_log_file(self):
+        return self.config.get("LOGGING", {}).get("LOG_FILE", "logs/probe.jsonl")
+
+    def get_log_max_bytes(self):
+        return int(self.config.get("LOGGING", {}).get("LOG_MAX_MB", 50)) * 1024 * 1024
+
+    def get_log_backups(self):
+        return int(self.config.get("LOGGING", {}).get("LOG_BACKUPS", 5))
+
+    def get_log_queue_size(self):
+        return int(self.config.get("LOGGING", {}).get("QUEUE_SIZE", 10000))
+
+    def get_payload_sample_rate(self):
+        """
+        Share of the payload dumps (result lists, LLM responses) written to the log
+        """
+        return float(self.config.get("LOGGING", {}).get("PAYLOAD_SAMPLE_RATE", 0.05))
+
+    def get_payload_max_chars(self):
+        return int(self.config.get("LOGGING", {}).get("PAYLOAD_MAX_CHARS", 4000))
+
     def save_config(self):
         with open("config.toml", "w") as f:
             toml.dump(self.config, f)
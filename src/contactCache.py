@@ -0,0 +1,152 @@
+import copy
+import time
+import asyncio
+import hashlib
+import logging as log
+from typing import List
+
+from src.cache import LRUCache, SQLiteKV
+from src.config import Config
+
+config = Config()
+
+VERSION_KEY = "__prompt_version__"
+
+
+def normalize_targets(targets: List[str] | None) -> str:
+    return "|".join(sorted({" ".join(str(target).lower().split()) for target in targets or []}))
+
+
+class ContactCache:
+    """
+    Contacts extracted by the LLM from a context chunk, keyed by a hash of the chunk text,
+    the model, the system prompt version and the normalized targets.
+
+    The contacts are kept without their context id, callers give them the id of the chunk on a hit.
+    Entries of another system prompt version are never hit, the persisted ones are dropped
+    as soon as the version changes (see `use_version`)
+    """
+
+    def __init__(
+        self,
+        ttl: int = 604800,
+        maxsize: int = 4096,
+        store: SQLiteKV | None = None,
+        enabled: bool = True,
+    ):
+        self.ttl = ttl
+        self.store = store
+        self.enabled = enabled
+        self.version = ""
+        self.memory = LRUCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+        self._version_check: asyncio.Future | None = None
+
+    def use_version(self, version: str):
+        """
+        Set the system prompt version, a new version invalidates the cached contacts
+        """
+        if version != self.version:
+            self.version = version
+            self.memory.clear()
+            self._version_check = None
+
+    def cache_key(self, content: str, targets: List[str] | None, model: str) -> str:
+        raw_key = f"{self.version}\n{model}\n{normalize_targets(targets)}\n{content}"
+        return hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+    async def get(self, content: str, targets: List[str] | None, model: str) -> List[dict] | None:
+        """
+        Cached contacts of the chunk (possibly empty), None on a miss
+        """
+        if not self.enabled:
+            return None
+        key = self.cache_key(content, targets, model)
+        entry = self.memory.get(key)
+        if entry is None and self.store is not None:
+            await self._check_version()
+            try:
+                entry = await asyncio.to_thread(self.store.get, key)
+            except Exception as e:
+                log.error(f"Contact cache store read failed: {e}")
+            if entry is not None:
+                self.memory.set(key, entry)
+
+        if entry is None or time.time() - entry[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(entry[0])
+
+    async def set(
+        self, content: str, targets: List[str] | None, model: str, contacts: List[dict]
+    ):
+        if not self.enabled:
+            return
+        key = self.cache_key(content, targets, model)
+        contacts = [
+            {name: value for name, value in contact.items() if name != "id"}
+            for contact in contacts
+        ]
+        entry = (contacts, time.time())
+        self.memory.set(key, entry)
+        if self.store is not None:
+            await self._check_version()
+            try:
+                await asyncio.to_thread(self.store.set, key, contacts, entry[1])
+            except Exception as e:
+                log.error(f"Contact cache store write failed: {e}")
+
+    def clear(self):
+        self.memory.clear()
+        if self.store is not None:
+            self.store.clear()
+            self._version_check = None
+        log.info("Contact cache cleared")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.memory),
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    async def _check_version(self):
+        """
+        Drop the persisted contacts of another system prompt version, once.
+        The concurrent lookups wait for the same check
+        """
+        if self._version_check is None:
+            self._version_check = asyncio.ensure_future(asyncio.to_thread(self._sync_version))
+        await self._version_check
+
+    def _sync_version(self):
+        try:
+            stored = self.store.get(VERSION_KEY)
+            if stored is not None and stored[0] == self.version:
+                return
+            if stored is not None:
+                log.warning(
+                    f"System prompt changed ({stored[0]} -> {self.version}), clearing the contact cache"
+                )
+            self.store.clear()
+            # far future stored_at keeps the version row out of the store trimming
+            self.store.set(VERSION_KEY, self.version, time.time() + 10 * 365 * 86400)
+        except Exception as e:
+            log.error(f"Contact cache version check failed: {e}")
+
+
+contact_cache = ContactCache(
+    ttl=config.get_contact_cache_ttl(),
+    maxsize=config.get_contact_cache_size(),
+    enabled=config.get_contact_cache_enabled(),
+    store=(
+        SQLiteKV(config.get_contact_cache_path(), table="chunk_contacts")
+        if config.get_contact_cache_persist()
+        else None
+    ),
+)
@@ -0,0 +1,167 @@
+import re
+import logging as log
+from typing import List, Tuple
+from urllib.parse import urlparse
+import phonenumbers
+
+from src.config import Config
+from src.contactScan import scan_contacts
+
+config = Config()
+
+TEL_ANCHOR_PATTERN = re.compile(r"\[Contact:\(tel:([^)]*)\)\]")
+MAILTO_ANCHOR_PATTERN = re.compile(r"\[Contact:\(mailto:([^)?]*)")
+ANCHOR_PATTERN = re.compile(r"\s*\[Contact:\([^)]*\)\]")
+TITLE_SEPARATOR_PATTERN = re.compile(r"\s+[|\-–—:·•»]\s+")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+INFO_WORDS = 25
+
+
+def normalize_phone(raw: str, country_code: str | None = None) -> str | None:
+    """
+    E.164 form of the phone number, None when it is not a valid number of the region
+    """
+    try:
+        number = phonenumbers.parse(raw, (country_code or "US").upper())
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def chunk_contacts(content: str, country_code: str | None = None) -> Tuple[set, set]:
+    """
+    Distinct emails and E.164 phone numbers of the chunk (tel: anchors and phone like text)
+    """
+    emails = set()
+    raw_phones = TEL_ANCHOR_PATTERN.findall(content)
+    for match in scan_contacts(content):
+        if match.kind == "email":
+            emails.add(match.value.lower())
+        else:
+            raw_phones.append(match.value)
+    phones = set()
+    for raw_phone in raw_phones:
+        phone = normalize_phone(raw_phone, country_code)
+        if phone is not None:
+            phones.add(phone)
+    return emails, phones
+
+
+def _words(text: str) -> set:
+    words = set()
+    for word in WORD_PATTERN.findall(text.lower()):
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if len(word) > 2:
+            words.add(word)
+    return words
+
+
+def match_target(text: str, targets: List[str] | None) -> str | None:
+    """
+    The target sharing the most words with the text, None when no target or a tie
+    """
+    text_words = _words(text)
+    scores = sorted(
+        ((len(_words(target) & text_words), target) for target in targets or []),
+        key=lambda score: score[0],
+        reverse=True,
+    )
+    if not scores or scores[0][0] == 0:
+        return None
+    if len(scores) > 1 and scores[1][0] == scores[0][0]:
+        return None
+    return scores[0][1]
+
+
+def vendor_name(title: str | None) -> str:
+    """
+    Vendor name out of a page title like "Acme Plumbing | Home"
+    """
+    for part in TITLE_SEPARATOR_PATTERN.split(title or ""):
+        part = part.strip()
+        if part and part.lower() not in {"home", "homepage", "contact", "contact us", "about us"}:
+            return part[:80]
+    return ""
+
+
+def is_site_email(email: str, content: str, link: str | None) -> bool:
+    """
+    The email is the site's own : an explicit mailto: anchor, or on the domain of the page
+    """
+    if email in {anchor.strip().lower() for anchor in MAILTO_ANCHOR_PATTERN.findall(content)}:
+        return True
+    host = urlparse(link or "").netloc.lower().split(":")[0]
+    email_domain = email.rsplit("@", 1)[-1]
+    return bool(host) and (host == email_domain or host.endswith(f".{email_domain}"))
+
+
+def contact_info(content: str, email: str) -> str:
+    """
+    The words around the email in the chunk, without the contact annotations
+    """
+    text = ANCHOR_PATTERN.sub("", content)
+    words = text.split()
+    position = next(
+        (index for index, word in enumerate(words) if email in word.lower()), 0
+    )
+    start = max(position - INFO_WORDS // 2, 0)
+    return " ".join(words[start : start + INFO_WORDS])
+
+
+def extract_direct_contacts(
+    data: List[dict], targets: List[str] | None, country_code: str | None = None
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Regex first extraction of the trivially structured chunks : one email, at most one phone
+    (or the phone of the Google Maps listing), a vendor name in the page title and a clear target.
+    Gives the contacts in the LLM result format (with the chunk id) and the chunks left for the LLM
+    """
+    if not config.get_direct_extraction_enabled():
+        return [], data
+
+    contacts = []
+    remaining_data = []
+    for chunk in data:
+        metadata = chunk["metadata"]
+        content = chunk["content"]
+        emails, phones = chunk_contacts(content, country_code)
+        if not phones and metadata.get("phone"):
+            maps_phone = normalize_phone(metadata["phone"], country_code)
+            phones = {maps_phone} if maps_phone else set()
+
+        name = vendor_name(metadata.get("title"))
+        target = match_target(f"{metadata.get('title') or ''} {content}", targets)
+        email = next(iter(emails)) if len(emails) == 1 else None
+        if (
+            email is None
+            or len(phones) > 1
+            or not name
+            or target is None
+            or not is_site_email(email, content, metadata.get("link"))
+        ):
+            remaining_data.append(chunk)
+            continue
+
+        contacts.append(
+            {
+                "id": metadata["id"],
+                "name": name,
+                "target": target,
+                "info": contact_info(content, email),
+                "contacts": {
+                    "email": email,
+                    "phone": next(iter(phones), ""),
+                },
+            }
+        )
+
+    if contacts:
+        log.info(
+            f"Direct extraction: {len(contacts)}/{len(data)} chunks without LLM, "
+            f"{len(remaining_data)} left for the LLM"
+        )
+    return contacts, remaining_data
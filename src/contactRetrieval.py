@@ -1,13 +1,25 @@
 import time
 import json
 import asyncio
+import hashlib
+import functools
 import logging as log
-from openai import AsyncOpenAI, OpenAI
-from typing import Iterator, List
+from dataclasses import dataclass
+from typing import List, Tuple
 
-from src.utils import inflating_retrieval_results, gpt_cost_calculator
+from src.config import Config
+from src.contactCache import contact_cache
+from src.contactExtractor import extract_direct_contacts
+from src.contextPacker import PackedContext, pack_context
+from src.deadline import Deadline, gather_within
+from src.llmClients import LLMClient, get_llm_client
+from src.metrics import timed_stage, record_llm_usage
+from src.tracing import log_payload
+from src.utils import inflating_retrieval_results, gpt_cost_calculator, count_tokens
 
-LOG_FILES = False
+CONTACTS_MODEL = "gpt-3.5-turbo-1106"
+
+config = Config()
 
 
 SYS_PROMPT = """You are an information researcher. Extract all maximum possible relevant vendors/peoples and their contact details from internet scraped context below, aiming to assist the user's goal in finding the right service providers or vendors with contacts, according to the target list. Only retrieve the contacts of vendor/person that can confidently server the user's goal (based on targets), strictly skip all unrelated.
@@ -17,6 +29,11 @@ Make sure the phone number is in E.164 format, based on country. Give empty list
 Example response (Only as an example format, data not to be used) : \n{"results": [{"contacts": {"email": "oakland@onetoyota.com","phone": "+15102818909"},"id":2, "name": "One Toyota Oakland", "target":"Car rentals","info":"One Toyota of Oakland offers a diverse selection of both new and pre-owned vehicles, prioritizing customer satisfaction with attentive service. They also provide SUV's as you need"},]}\n"""
 
 
+# cached contacts of another system prompt are never reused
+SYS_PROMPT_VERSION = hashlib.sha1(SYS_PROMPT.encode("utf-8")).hexdigest()[:12]
+contact_cache.use_version(SYS_PROMPT_VERSION)
+
+
 ## ------------------------ Async ------------------------ ##
 
 
@@ -70,8 +87,31 @@ def print_and_write_response(response_json, output_file="output.txt"):
             print("\n" + "-" * 40 + "\n")
 
 
+@dataclass
+class RetrievalUsage:
+    """
+    Tokens and cost of the contact retrieval LLM calls of a request
+    """
+
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cost: float):
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += cost
+
+
 async def extract_thread_contacts(
-    id: int, data, prompt: str, targets: List[str] | None, openai_client: OpenAI
+    id: int,
+    data,
+    prompt: str,
+    targets: List[str] | None,
+    llm_client: LLMClient,
+    usage: RetrievalUsage | None = None,
 ) -> json:
     """
     Extract the contacts from the search results using LLM
@@ -81,8 +121,8 @@ async def extract_thread_contacts(
     log.info(f"Contact Retrival Thread {id} started")
 
     try:
-        response = await openai_client.chat.completions.create(
-            model="gpt-3.5-turbo-1106",
+        response = await llm_client.chat(
+            max_retries=0,
             response_format={"type": "json_object"},
             temperature=0.1,
             seed=3,
@@ -108,10 +148,16 @@ async def extract_thread_contacts(
             f"Input Tokens used: {response.usage.prompt_tokens}, Output Tokens used: {response.usage.completion_tokens}"
         )
         log.info(f"Cost for contact retrival {id}: ${cost}")
+        record_llm_usage(
+            llm_client.model, response.usage.prompt_tokens, response.usage.completion_tokens, cost
+        )
+        if usage is not None:
+            usage.add(response.usage.prompt_tokens, response.usage.completion_tokens, cost)
 
         response = json.loads(response.choices[0].message.content)
 
-        log.info(f"Contact Retrival Thread {id} finished : {response}\n")
+        log.info(f"Contact Retrival Thread {id} finished")
+        log_payload(f"Contact Retrival Thread {id} response", lambda: response)
 
     except Exception as e:
         log.error(f"Error in {id} LLM API call: {e}")
@@ -120,94 +166,252 @@ async def extract_thread_contacts(
     return response
 
 
+def deflate_context_data(data) -> List[dict]:
+    """
+    Keep only what the LLM needs from the context documents. The id is the position of the
+    chunk in the call, the context ids are per page (see resolve_call_contacts)
+    """
+    return [
+        {
+            "id": position,
+            "title": d["metadata"]["title"],
+            "content": d["content"],
+        }
+        for position, d in enumerate(data)
+    ]
+
+
+def prompt_overhead_tokens(prompt: str, targets: List[str] | None) -> int:
+    """
+    Prompt tokens of a contact retrieval call without its context
+    """
+    user_message = f"Context: []\n\nGoal: {prompt}\nTargets: {targets}\nAnswer:All relevant and accurate contact details for above Question in JSON:"
+    return _system_prompt_tokens() + count_tokens(user_message)
+
+
+@functools.lru_cache(maxsize=1)
+def _system_prompt_tokens() -> int:
+    return count_tokens(SYS_PROMPT)
+
+
+def pack_retrieval_context(
+    data, prompt: str, targets: List[str] | None, max_thread: int, token_budget: int | None = None
+) -> PackedContext:
+    """
+    Pack the context data into the LLM calls by token budget (LLM_PROMPT_TOKENS), see pack_context
+    """
+    return pack_context(
+        data,
+        token_budget=token_budget or config.get_llm_prompt_token_budget(),
+        max_calls=max_thread,
+        overhead_tokens=prompt_overhead_tokens(prompt, targets),
+    )
+
+
+async def split_cached_chunks(
+    data, targets: List[str] | None
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Split the context data into the cached contacts of its chunks (given the chunk id)
+    and the chunks still to send to the LLM
+    """
+    cached_contacts = []
+    uncached_data = []
+    chunk_contacts = await asyncio.gather(
+        *(contact_cache.get(chunk["content"], targets, CONTACTS_MODEL) for chunk in data)
+    )
+    for chunk, contacts in zip(data, chunk_contacts):
+        if contacts is None:
+            uncached_data.append(chunk)
+            continue
+        chunk_id = chunk["metadata"]["id"]
+        cached_contacts.extend({**contact, "id": chunk_id} for contact in contacts)
+
+    if len(uncached_data) < len(data):
+        log.info(
+            f"Contact cache: {len(data) - len(uncached_data)}/{len(data)} chunks cached, "
+            f"{len(cached_contacts)} contacts reused"
+        )
+    return cached_contacts, uncached_data
+
+
+def resolve_call_contacts(call: List[dict], result) -> List[List[dict]] | None:
+    """
+    The contacts of a completed LLM call per chunk of the call (their id is the chunk position,
+    see deflate_context_data), given the context id of their chunk. None for a failed call
+    """
+    if not isinstance(result, dict) or not isinstance(result.get("results"), list):
+        return None
+    chunk_contacts = [[] for _ in call]
+    for contact in result["results"]:
+        if not isinstance(contact, dict):
+            continue
+        try:
+            position = int(contact.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= position < len(call):
+            chunk_id = call[position]["metadata"]["id"]
+            chunk_contacts[position].append({**contact, "id": chunk_id})
+    return chunk_contacts
+
+
+async def cache_call_contacts(
+    call: List[dict], chunk_contacts: List[List[dict]], targets: List[str] | None
+):
+    """
+    Cache the contacts of a completed LLM call per chunk, chunks without contacts are cached empty
+    """
+    await asyncio.gather(
+        *(
+            contact_cache.set(chunk["content"], targets, CONTACTS_MODEL, contacts)
+            for chunk, contacts in zip(call, chunk_contacts)
+        )
+    )
+
+
+async def contacts_call(
+    thread_id: int,
+    call: List[dict],
+    prompt: str,
+    targets: List[str] | None,
+    llm_client: LLMClient,
+    usage: RetrievalUsage,
+) -> json:
+    """
+    extract_thread_contacts on a packed call, caching its contacts per chunk.
+    Failed calls are not cached
+    """
+    result = await extract_thread_contacts(
+        thread_id, deflate_context_data(call), prompt, targets, llm_client, usage
+    )
+    chunk_contacts = resolve_call_contacts(call, result)
+    if chunk_contacts is None:
+        return result
+    await cache_call_contacts(call, chunk_contacts, targets)
+    return {"results": [contact for contacts in chunk_contacts for contact in contacts]}
+
+
+def log_retrieval_usage(packed: PackedContext, usage: RetrievalUsage):
+    log.info(
+        f"Contact retrieval cost: ${usage.cost:.5f} for {usage.calls} LLM calls "
+        f"({usage.prompt_tokens} prompt / {usage.completion_tokens} completion tokens, "
+        f"{packed.prompt_tokens} prompt tokens packed, estimated ${packed.estimated_cost():.5f}), "
+        f"dropped chunks: {len(packed.dropped)}"
+    )
+
+
 async def retrieval_multithreading(
     data,
     prompt: str,
-    solution: str | None,
-    open_ai_key: str,
-    context_chunk_size: int = 5,
+    targets: List[str] | None,
     max_thread: int = 5,
-    timeout: int = 10,
+    token_budget: int | None = None,
+    country_code: str | None = None,
+    deadline: Deadline | None = None,
 ):
     """
-    Creates multiple LLM calls
+    Creates multiple LLM calls, yields the inflated contacts of each call as soon as it completes.
+    The pending calls are cancelled when the consumer stops early or the retrieval budget of the
+    request deadline runs out
     """
-    # Divide the data into chunks of size chunk_size
-    data_chunks = [
-        data[i : i + context_chunk_size]
-        for i in range(0, len(data), context_chunk_size)
-    ]
-    data_chunks = data_chunks[:max_thread]
+    direct_contacts, llm_data = extract_direct_contacts(data, targets, country_code)
+    cached_contacts, uncached_data = await split_cached_chunks(llm_data, targets)
+    packed = pack_retrieval_context(uncached_data, prompt, targets, max_thread, token_budget)
+    usage = RetrievalUsage()
 
-    log.warning(f"Starting openai async fetch. Data Chunk length :{len(data_chunks)}\n")
-    try:
-        llm_threads = []
-        client = AsyncOpenAI(api_key=open_ai_key, max_retries=0)
+    log.warning(f"Starting openai async fetch. Data Chunk length :{len(packed.calls)}\n")
+    client = get_llm_client(CONTACTS_MODEL)
 
-    except Exception as e:
-        log.error(f"Error in async open ai: {e}")
-        yield b"[]"
+    llm_threads = [
+        asyncio.create_task(
+            contacts_call(thread_id + 1, call, prompt, targets, client, usage)
+        )
+        for thread_id, call in enumerate(packed.calls)
+    ]
 
-    # Create asyncio tasks for each data chunk with enumeration
-    for thread_id, chunk in enumerate(data_chunks):
-        task = extract_thread_contacts(thread_id + 1, chunk, prompt, solution, client)
-        llm_threads.append(task)
+    stage_end = None
+    if deadline is not None:
+        stage_end = time.monotonic() + deadline.budget("retrieval")
 
-    for completed_task in asyncio.as_completed(llm_threads):
-        try:
-            result = await completed_task
-            result = result["results"] if result != [] else []
-            yield result
-        except Exception as e:
-            log.error(f"Error in task: {e}")
+    try:
+        if direct_contacts or cached_contacts:
+            yield inflating_retrieval_results(direct_contacts + cached_contacts, data)
+
+        pending = set(llm_threads)
+        while pending:
+            timeout = max(stage_end - time.monotonic(), 0) if stage_end is not None else None
+            done, pending = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                log.warning(f"Retrieval budget spent, {len(pending)} LLM calls cancelled")
+                deadline.cut("retrieval")
+                break
+
+            for completed_task in done:
+                try:
+                    result = completed_task.result()
+                except Exception as e:
+                    log.error(f"Error in task: {e}")
+                    continue
+
+                contacts = result.get("results", []) if isinstance(result, dict) else []
+                if isinstance(contacts, dict):
+                    contacts = [contacts]
+                elif not isinstance(contacts, list):
+                    log.warning(f"Unexpected result format: {result}")
+                    continue
+
+                yield inflating_retrieval_results(contacts, data)
+    finally:
+        for task in llm_threads:
+            task.cancel()
+        log_retrieval_usage(packed, usage)
 
     log.info(f"OpenAI task completed")
 
 
+@timed_stage("retrieval")
 async def static_retrieval_multifetching(
     data,
     prompt: str,
     targets: List[str] | None,
-    open_ai_key: str,
-    context_chunk_size: int = 5,
     max_thread: int = 5,
-    timeout: int = 10,
+    token_budget: int | None = None,
+    country_code: str | None = None,
+    deadline: Deadline | None = None,
 ) -> list:
     """
-    Creates multiple LLM calls
+    Creates multiple LLM calls, the calls still running when the retrieval budget
+    of the request deadline runs out are cancelled
     """
-    # Deflate the data for LLM data retrieval
-    context_data = [
-        {
-            "id": d["metadata"]["id"],
-            "title": d["metadata"]["title"],
-            "content": d["content"],
-        }
-        for d in data
-    ]
-
-    # Divide the data into chunks of size chunk_size
-    data_chunks = [
-        context_data[i : i + context_chunk_size]
-        for i in range(0, len(data), context_chunk_size)
-    ]
-    data_chunks = data_chunks[:max_thread]
+    # Extract the trivially structured chunks directly, skip the cached chunks
+    # and pack the others for LLM data retrieval
+    direct_contacts, llm_data = extract_direct_contacts(data, targets, country_code)
+    cached_contacts, uncached_data = await split_cached_chunks(llm_data, targets)
+    packed = pack_retrieval_context(uncached_data, prompt, targets, max_thread, token_budget)
+    usage = RetrievalUsage()
     t_start = time.time()
-    log.warning(f"Starting openai async fetch. Data Chunk length :{len(data_chunks)}\n")
+    log.warning(f"Starting openai async fetch. Data Chunk length :{len(packed.calls)}\n")
     try:
         llm_threads = []
-        client = AsyncOpenAI(api_key=open_ai_key, max_retries=0)
+        client = get_llm_client(CONTACTS_MODEL)
 
-        for thread_id, chunk in enumerate(data_chunks):
-            task = extract_thread_contacts(
-                thread_id + 1, chunk, prompt, targets, client
-            )
+        for thread_id, call in enumerate(packed.calls):
+            task = contacts_call(thread_id + 1, call, prompt, targets, client, usage)
             llm_threads.append(task)
 
-        results = await asyncio.gather(*llm_threads, return_exceptions=True)
-        combined_results = []
+        timeout = deadline.budget("retrieval") if deadline is not None else None
+        results, timed_out = await gather_within(llm_threads, timeout)
+        if timed_out:
+            deadline.cut("retrieval")
+        combined_results = direct_contacts + cached_contacts
 
         for result in results:
+            if isinstance(result, Exception):
+                log.error(f"Error in task: {result}")
+                continue
             if not result:
                 log.warn(f"Unexpected result format: {result}")
                 continue
@@ -222,7 +426,8 @@ async def static_retrieval_multifetching(
         log.info(
             f"\nTotal time taken: {t_end - t_start}; Total results: {len(combined_results)}\n"
         )
-        log.info(f"Contacts extracted by OpenAI: {combined_results}")
+        log_payload("Contacts extracted by OpenAI", lambda: combined_results, level=log.INFO)
+        log_retrieval_usage(packed, usage)
 
         # inflate the results
         log.info(f" Inflating the results, with the original data")
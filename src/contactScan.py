@@ -0,0 +1,84 @@
+import re
+from typing import List, NamedTuple
+
+EMAIL_REGEX = r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"
+PHONE_REGEX = r"\b(?:\+\d{1,3}\s?)?(?:\(\d{1,4}\)|\d{1,4})[\s.-]?\d{3,9}[\s.-]?\d{4}\b|\b\d{10}\b"
+
+EMAIL_PATTERN = re.compile(EMAIL_REGEX)
+PHONE_PATTERN = re.compile(PHONE_REGEX)
+# a phone number needs at least 7 digits, with 3 in a row in every accepted format
+DIGIT_RUN_PATTERN = re.compile(r"\d{3}")
+
+
+class ContactMatch(NamedTuple):
+    kind: str  # "email" or "phone"
+    start: int
+    end: int
+    value: str
+
+
+def may_have_email(text: str) -> bool:
+    return "@" in text
+
+
+def may_have_phone(text: str) -> bool:
+    return DIGIT_RUN_PATTERN.search(text) is not None
+
+
+def find_email(text: str) -> re.Match | None:
+    if not may_have_email(text):
+        return None
+    return EMAIL_PATTERN.search(text)
+
+
+def find_phone(text: str) -> re.Match | None:
+    if not may_have_phone(text):
+        return None
+    return PHONE_PATTERN.search(text)
+
+
+def has_contacts(text: str, email_only: bool = False) -> bool:
+    """
+    Whether the text has an email (or a phone number unless `email_only`), the cheap
+    checks run before the regexes
+    """
+    if find_email(text) is not None:
+        return True
+    if email_only:
+        return False
+    return find_phone(text) is not None
+
+
+def scan_contacts(text: str, emails: bool = True, phones: bool = True) -> List[ContactMatch]:
+    """
+    Email and phone matches of the text with their spans, ordered by position.
+    Phone matches inside an email (digits of the local part) are dropped.
+
+    Each precompiled pattern runs once and only when its pre-filter passes, on CPython
+    this is faster than a single alternation pattern, which retries both at every position
+    """
+    email_matches = (
+        [
+            ContactMatch("email", match.start(), match.end(), match.group())
+            for match in EMAIL_PATTERN.finditer(text)
+        ]
+        if emails and may_have_email(text)
+        else []
+    )
+    if not (phones and may_have_phone(text)):
+        return email_matches
+
+    phone_matches = [
+        ContactMatch("phone", match.start(), match.end(), match.group())
+        for match in PHONE_PATTERN.finditer(text)
+    ]
+    if not email_matches:
+        return phone_matches
+
+    email_spans = [(match.start, match.end) for match in email_matches]
+    phone_matches = [
+        match
+        for match in phone_matches
+        if not any(start <= match.start < end for start, end in email_spans)
+    ]
+    return sorted(email_matches + phone_matches, key=lambda match: match.start)
@@ -0,0 +1,87 @@
+import math
+import logging as log
+from dataclasses import dataclass, field
+from typing import List
+
+from src.contactScan import scan_contacts
+from src.utils import count_tokens, gpt_cost_calculator
+
+# per context item JSON keys and separators in the prompt
+ITEM_OVERHEAD_TOKENS = 12
+
+
+def chunk_tokens(chunk: dict) -> int:
+    """
+    Prompt tokens of a context chunk
+    """
+    text = f"{chunk['metadata'].get('title') or ''} {chunk['content']}"
+    return count_tokens(text) + ITEM_OVERHEAD_TOKENS
+
+
+def contact_density(chunk: dict, tokens: int) -> float:
+    """
+    Emails and phone numbers per 100 tokens of the chunk
+    """
+    contacts = len(scan_contacts(chunk["content"]))
+    return 100 * contacts / max(tokens, 1)
+
+
+@dataclass
+class PackedContext:
+    calls: List[List[dict]] = field(default_factory=list)
+    dropped: List[dict] = field(default_factory=list)
+    prompt_tokens: int = 0
+
+    def estimated_cost(self, model: str = "gpt-3.5-turbo") -> float:
+        """
+        Input cost of the packed calls, the output tokens are only known after the calls
+        """
+        return gpt_cost_calculator(self.prompt_tokens, 0, model=model)
+
+
+def pack_context(
+    data: List[dict],
+    token_budget: int,
+    max_calls: int,
+    overhead_tokens: int = 0,
+) -> PackedContext:
+    """
+    Bin-pack the context chunks into at most `max_calls` LLM calls of `token_budget` prompt tokens.
+
+    Chunks are taken by Link rank, then by contact density, and go to the first call they fit in
+    (first fit), a chunk larger than the budget gets a call of its own. What does not fit is dropped.
+    `overhead_tokens` is the fixed part of every prompt (system prompt, goal and targets)
+    """
+    content_budget = max(token_budget - overhead_tokens, 1)
+    # counted once per chunk, the chunks are shared with the callers and left untouched
+    chunk_token_counts = {id(chunk): chunk_tokens(chunk) for chunk in data}
+    prioritized = sorted(
+        data,
+        key=lambda chunk: (
+            chunk["metadata"].get("rank") if chunk["metadata"].get("rank") is not None else math.inf,
+            -contact_density(chunk, chunk_token_counts[id(chunk)]),
+        ),
+    )
+
+    packed = PackedContext()
+    used_tokens = []
+    for chunk in prioritized:
+        tokens = chunk_token_counts[id(chunk)]
+        for index, used in enumerate(used_tokens):
+            if used + tokens <= content_budget:
+                packed.calls[index].append(chunk)
+                used_tokens[index] += tokens
+                break
+        else:
+            if len(packed.calls) < max_calls:
+                packed.calls.append([chunk])
+                used_tokens.append(tokens)
+            else:
+                packed.dropped.append(chunk)
+
+    packed.prompt_tokens = sum(used_tokens) + overhead_tokens * len(packed.calls)
+    log.info(
+        f"Packed {len(data) - len(packed.dropped)} chunks into {len(packed.calls)} LLM calls "
+        f"({used_tokens} content tokens, budget {content_budget}), dropped {len(packed.dropped)}"
+    )
+    return packed
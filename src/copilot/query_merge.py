@@ -1,13 +1,8 @@
-import os
 import time
 import logging as log
-from openai import OpenAI
 import json
-from dotenv import load_dotenv
 
-load_dotenv()
-
-MY_ENV_VAR = os.getenv("OPENAI_API_KEY")
+from src.llmClients import get_llm_client
 
 
 System_Prompt_question_gen = 'Given the user\'s goal and the questions asked to the user with its answers, merge the questions into the goal to make it less vague. If the goal is already well described, respond with the goal as it is.\nAlso assign tags(max 2) to the goals form the list -"Education","Internship","Equipment","Research","Sales","Entrepreneurship","Logistics","Relocation","Tutoring","Travel","Rental","Food & Beverages","Real Estate","Health & Fitness","Technology","Finance","Medical Services","Skilled Services","Volunteer Work","Personal Growth","Hobbies","Retirement","Style & Fashion","Adventure Sports","Music & Entertainment","Jobs","Higher Studies","Hardware Fix", "Equipments", "Large Equipments", "Car". Give empty list if none. \nRespond in JSON, Format - {"merged_goal":"", "tags": []}'
@@ -25,12 +20,11 @@ question_gen_few_shot = [
 
 
 ## TODO : Also extract Date and location form the goal if given.
-def merge_goal(choices: dict, goal: str):
+async def merge_goal(choices: dict, goal: str):
     """
     Reframe and generates goal query based on the user's choses and preferences
     """
     start_time = time.time()
-    client = OpenAI(api_key=MY_ENV_VAR)
     if not choices:
         raise Exception("No choices provided")
 
@@ -40,8 +34,7 @@ def merge_goal(choices: dict, goal: str):
     choices_str = prepare_choice(choices)
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = await get_llm_client("gpt-3.5-turbo").chat(
             response_format={"type": "json_object"},
             messages=[
                 {"role": "system", "content": System_Prompt_question_gen},
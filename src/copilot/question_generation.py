@@ -1,13 +1,8 @@
-import os
 import time
 import logging as log
-from openai import OpenAI
 import json
-from dotenv import load_dotenv
 
-load_dotenv()
-
-MY_ENV_VAR = os.getenv("OPENAI_API_KEY")
+from src.llmClients import get_llm_client
 
 
 System_Prompt_question_gen = 'Below is the user\'s goal or task, based on clear understanding give the following in JSON:\n- List of top(max 5) very important questions for the user with options to improve the goal statement and make the goal less vague. Questions to be asked to remove vagueness and improvement for more clarity for others. Its type can be "choice" and "input", if input then give options as empty list. Always prefer choice over input, number of choices not more than 5. Do not ask questions, only when it\'s very well described goal(respond with empty list for questions). Do not ask Location and exact date to the user. \n- State if it is a product, service or invalid goal (in goal_type), invalid when its invalid or inappropriate. Format - {"questions":[{"question":"","type":"","options":["",""],},{}],"goal_type":""}'
@@ -32,19 +27,17 @@ question_gen_few_shot = [
 ]
 
 
-def generate_question(query: str, location: str | None):
+async def generate_question(query: str, location: str | None):
     """
     Generates questions based on the user's goal or task
     """
     start_time = time.time()
-    client = OpenAI(api_key=MY_ENV_VAR)
     location_string = ""
     if location:
         location_string = f"Location:{location},\n"
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-1106-preview",
+        response = await get_llm_client("gpt-4-1106-preview").chat(
             response_format={"type": "json_object"},
             messages=[
                 {"role": "system", "content": System_Prompt_question_gen},
@@ -1,17 +1,30 @@
 import json
 import re
 import time
+import asyncio
 import logging as log
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup, NavigableString, Tag
-from typing import Dict, Any, Iterator, List, Sequence, cast, Tuple
+from lxml import etree
+from typing import Dict, Any, AsyncIterator, Iterator, List, Sequence, cast, Tuple
 from langchain.docstore.document import Document
 from langchain.retrievers.document_compressors import LLMChainExtractor
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from src.utils import create_documents, document_lambda, document2map
+from src.utils import create_documents, document_lambda, document2map, get_encoder
+from src.contactScan import has_contacts, scan_contacts
+from src.config import Config
+from src.deadline import Deadline
+from src.metrics import timed_stage
+from src.debugArtifacts import debug_artifacts
 
 
-LOG_FILES = False
+# rough characters per token of web page text, sizes the windows before tokenizing them
+CHARS_PER_TOKEN = 4
+
+config = Config()
+
+LXML_HTML_PARSER = etree.HTMLParser(
+    encoding="utf-8", remove_blank_text=False, no_network=True
+)
 
 
 def transform_documents(
@@ -75,13 +88,31 @@ def remove_unwanted_tags(html_content, unwanted_tags: List[str]) -> str:
             element.decompose()
     return soup
 
-def tags_cleaning(html_content, unwanted_tags: List[str] = ["script", "style"],
+def tags_cleaning(
+    html_content,
+    unwanted_tags: List[str] = ["script", "style"],
+    tags_to_extract: List[str] = ["p", "li", "div", "a"],
+    backend: str | None = None,
+) -> str:
+    """
+    Extract the text of the `tags_to_extract` elements, with the pluggable extraction backend
+    (`HTML_EXTRACTOR` in config, `lxml` or `bs4`)
+    """
+    backend = backend or config.get_html_extractor()
+    extractor = HTML_EXTRACTORS.get(backend)
+    if extractor is None:
+        log.warning(f"Unknown html extractor {backend}, using bs4")
+        extractor = bs4_tags_cleaning
+    return extractor(html_content, unwanted_tags, tags_to_extract)
+
+
+def bs4_tags_cleaning(html_content, unwanted_tags: List[str] = ["script", "style"],
     tags_to_extract: List[str] = ["p", "li", "div", "a"]) -> str:
 
+    text_parts: List[str] = []
+    contact_hrefs: List[str] = []
     try: 
         soup = BeautifulSoup(html_content, "html.parser")
-        text_parts: List[str] = []
-        contact_hrefs: List[str] = []
         for tag in unwanted_tags:
             for element in soup.find_all(tag):
                 element.decompose()
@@ -95,6 +126,87 @@ def tags_cleaning(html_content, unwanted_tags: List[str] = ["script", "style"],
 
     return " ".join(text_parts), contact_hrefs
 
+
+def lxml_tags_cleaning(html_content, unwanted_tags: List[str] = ["script", "style"],
+    tags_to_extract: List[str] = ["p", "li", "div", "a"]) -> str:
+    """
+    Single pass over the lxml tree, gives the same text and contact annotations as bs4_tags_cleaning.
+    Only the outermost `tags_to_extract` elements are read, text of the non contact links is skipped
+    """
+    unwanted = _tag_names(unwanted_tags)
+    extract = _tag_names(tags_to_extract)
+    text_parts: List[str] = []
+
+    def add_string(owner, string: str):
+        if owner.tag == "a" and (href := owner.get("href")):
+            if href.startswith(("mailto:", "tel:")):
+                text_parts.append(f"{string.strip()} [Contact:({href})]")
+        else:
+            text_parts.append(string.strip())
+
+    try:
+        root = etree.fromstring(
+            html_content.encode("utf-8", errors="ignore"), LXML_HTML_PARSER
+        )
+        if root is None:
+            return "", []
+
+        region = None
+        skip = None
+        for event, element in etree.iterwalk(
+            root, events=("start", "end", "comment")
+        ):
+            if event == "comment":
+                # bs4 keeps the comments as strings of their parent
+                if skip is None and region is not None:
+                    if element.text:
+                        add_string(element.getparent(), element.text)
+                    if element.tail:
+                        add_string(element.getparent(), element.tail)
+            elif event == "start":
+                if skip is not None:
+                    continue
+                if element.tag in unwanted:
+                    skip = element
+                    continue
+                if region is None and element.tag in extract:
+                    region = element
+                if region is not None and element.text:
+                    add_string(element, element.text)
+            else:
+                if skip is not None:
+                    if element is not skip:
+                        continue
+                    skip = None
+                if element is region:
+                    region = None
+                    continue
+                if region is not None and element.tail:
+                    add_string(element.getparent(), element.tail)
+    except Exception as e:
+        log.error(f"Error in lxml tags_cleaning: {e}")
+
+    return " ".join(text_parts), []
+
+
+def _tag_names(tags) -> set:
+    """
+    Flatten the (possibly nested) tag lists to a set of names
+    """
+    if isinstance(tags, str):
+        return {tags}
+    names = set()
+    for tag in tags:
+        names |= _tag_names(tag)
+    return names
+
+
+HTML_EXTRACTORS = {
+    "bs4": bs4_tags_cleaning,
+    "lxml": lxml_tags_cleaning,
+}
+
+
 # TODO : Remove it
 def extract_tags(html_content, tags: List[str]) -> str:
     soup = BeautifulSoup(html_content, "html.parser")
@@ -199,35 +311,85 @@ def preprocess_docs(docs: List[Document]) -> List[dict]:
     t_flag2 = time.time()
     log.info(f"BeautifulSoupTransformer time: {t_flag2 - t_flag1}")
 
-    if LOG_FILES:
-        with open("src/log_data/docs_beautify.json", "w") as f:
-            json.dump(document2map(docs_transformed), f)
+    debug_artifacts.dump("docs_beautify", lambda: document2map(docs_transformed))
 
     return docs_transformed, site_contact_links
 
 
-# TODO : This is a blind split, in future we should use a contact focused split
-def docs_recursive_split(
-    docs: Document, chunk_size: int = 400, overlap: int = 15
-) -> List[Document]:
+def contact_windows(text: str, chunk_size: int = 400, email_only: bool = True) -> List[str]:
+    """
+    Windows of at most `chunk_size` tokens centered on the contacts of the text.
+    Contacts close enough to share a window are merged into one and windows never overlap,
+    only the kept text is tokenized
+    """
+    char_budget = chunk_size * CHARS_PER_TOKEN
+    encoder = get_encoder()
+
+    # contact spans with their tokens, merged while they fit in one window
+    cores = []
+    for match in scan_contacts(text, phones=not email_only):
+        if cores and match.end - cores[-1][0] <= char_budget:
+            core_start, core_end, core_tokens = cores[-1]
+            tokens = core_tokens + len(encoder.encode_ordinary(text[core_end : match.end]))
+            if match.end <= core_end or tokens <= chunk_size:
+                cores[-1] = [core_start, max(core_end, match.end), max(tokens, core_tokens)]
+                continue
+        tokens = len(encoder.encode_ordinary(text[match.start : match.end]))
+        cores.append([match.start, match.end, tokens])
+
+    windows = []
+    for index, (core_start, core_end, core_tokens) in enumerate(cores):
+        # pad the core up to the budget, without crossing into the neighbour windows
+        pad = max(char_budget - (core_end - core_start), 0) // 2
+        lower = cores[index - 1][1] if index > 0 else 0
+        upper = cores[index + 1][0] if index + 1 < len(cores) else len(text)
+        start = max(core_start - pad, (lower + core_start) // 2 if index > 0 else lower)
+        end = min(core_end + pad, (core_end + upper) // 2 if index + 1 < len(cores) else upper)
+
+        # whole words at the edges
+        if start > 0 and not text[start - 1].isspace():
+            space = text.find(" ", start, core_start)
+            start = space + 1 if space != -1 else start
+        if end < len(text) and not text[end].isspace():
+            space = text.rfind(" ", core_end, end)
+            end = space if space != -1 else end
+
+        left_tokens = encoder.encode_ordinary(text[start:core_start])
+        right_tokens = encoder.encode_ordinary(text[core_end:end])
+        budget = max(chunk_size - core_tokens, 0)
+        if len(left_tokens) + len(right_tokens) <= budget:
+            windows.append(text[start:end].strip())
+            continue
+
+        # the character estimate was short, trim the padding evenly in tokens
+        left_count = min(len(left_tokens), max(budget // 2, budget - len(right_tokens)))
+        right_count = min(len(right_tokens), budget - left_count)
+        left = encoder.decode(left_tokens[len(left_tokens) - left_count :]) if left_count else ""
+        right = encoder.decode(right_tokens[:right_count]) if right_count else ""
+        windows.append(f"{left}{text[core_start:core_end]}{right}".strip())
+
+    return windows
+
+
+@timed_stage("split")
+def docs_contact_split(
+    docs: List[Document], chunk_size: int = 400, email_only: bool = True
+) -> List[dict]:
     """
-    Split the documents into chunks using RecursiveCharacterTextSplitter
+    Split the documents into token bounded windows around their contacts (see contact_windows),
+    the text away from the contacts is never tokenized
     """
     t_flag1 = time.time()
-    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=chunk_size, chunk_overlap=overlap
-    )
-    splits = splitter.split_documents(docs)
+    splits = [
+        {"metadata": dict(doc.metadata), "content": window}
+        for doc in docs
+        for window in contact_windows(doc.page_content, chunk_size, email_only=email_only)
+    ]
 
     t_flag2 = time.time()
-    log.info(f"RecursiveCharacterTextSplitter time: {t_flag2 - t_flag1}")
+    log.info(f"Contact split time: {t_flag2 - t_flag1}")
 
-    # convert to dictoinary
-    splits = document2map(splits)
-
-    if LOG_FILES:
-        with open("src/log_data/splits.json", "w") as f:
-            json.dump(splits, f)
+    debug_artifacts.dump("splits", splits)
 
     log.info(f"Total data splits: {len(splits)}")
     return splits
@@ -237,14 +399,7 @@ def contains_contacts(text: str, email_only: bool = False) -> bool:
     """
     Check if the text contains email or phone number
     """
-    # Regular expression patterns for emails and phone numbers
-    email_pattern = r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b"
-    phone_pattern = r"\b(?:\+\d{1,3}\s?)?(?:\(\d{1,4}\)|\d{1,4})[\s.-]?\d{3,9}[\s.-]?\d{4}\b|\b\d{10}\b"
-
-    contains_email = bool(re.search(email_pattern, text))
-    contains_phone = bool(re.search(phone_pattern, text)) if not email_only else False
-
-    return contains_email or contains_phone
+    return has_contacts(text, email_only=email_only)
 
 
 def relevant_data(extracted_content):
@@ -262,9 +417,7 @@ def relevant_data(extracted_content):
     t_flag2 = time.time()
     log.info(f"Extraction time: {t_flag2 - t_flag1}")
 
-    if LOG_FILES:
-        with open("src/log_data/context_data.json", "w") as f:
-            json.dump(data, f)
+    debug_artifacts.dump("context_data", data)
 
     return data
 
@@ -303,12 +456,59 @@ def process_data_docs(html_docs: Document, chunk_size: int = 400):
         log.error("No relevant data found")
         return [], [], unused_docs
 
-    data = docs_recursive_split(docs=_used_docs, chunk_size=chunk_size, overlap=15)
+    data = docs_contact_split(docs=_used_docs, chunk_size=chunk_size)
 
     data = relevant_data(extracted_content=data)
 
-    if LOG_FILES:
-        with open("src/log_data/unused_context_data.json", "w") as f:
-            json.dump(document2map(unused_docs), f)
+    debug_artifacts.dump("unused_context_data", lambda: document2map(unused_docs))
 
     return data, [], unused_docs
+
+
+async def stream_data_docs(
+    html_docs: AsyncIterator[Document],
+    chunk_size: int = 400,
+    max_chunks: int = 25,
+    deadline: Deadline | None = None,
+    stage: str = "scrape",
+):
+    """
+    Process the documents as they are scraped, like process_data_docs.
+    Stops consuming (and closes) the stream once `max_chunks` contact chunks are collected,
+    or when the `stage` budget of the request deadline runs out
+
+    Returns : context data, site contact links, unused docs, number of docs consumed
+    """
+    data = []
+    unused_docs = []
+    consumed = 0
+    timeout = deadline.budget(stage) if deadline is not None else None
+
+    try:
+        async with asyncio.timeout(timeout) as scrape_timer:
+            async for doc in html_docs:
+                consumed += 1
+                if not contains_contacts(doc.page_content, email_only=True):
+                    unused_docs.append(doc)
+                    continue
+
+                splits = docs_contact_split(docs=[doc], chunk_size=chunk_size)
+                data.extend(relevant_data(extracted_content=splits))
+                if len(data) >= max_chunks:
+                    log.info(
+                        f"Collected {len(data)} contact chunks from {consumed} docs, stopping the scrape early"
+                    )
+                    break
+    except TimeoutError:
+        if not scrape_timer.expired():
+            raise
+        log.warning(f"Scrape budget of {timeout:.2f}s spent after {consumed} docs")
+        deadline.cut(stage)
+    finally:
+        await html_docs.aclose()
+
+    log.warn(f"Contact chunks after streaming {consumed} docs: {len(data)}")
+
+    debug_artifacts.dump("unused_context_data", lambda: document2map(unused_docs))
+
+    return data, [], unused_docs, consumed
@@ -0,0 +1,108 @@
+import time
+import asyncio
+import logging as log
+from typing import Awaitable, Dict, Iterable, List, Tuple
+
+from src.config import Config
+
+config = Config()
+
+
+class Deadline:
+    """
+    Time budget of a request, shared by its pipeline stages
+    (search, scrape, secondary_search, secondary_scrape and retrieval).
+
+    Each stage runs for at most its own budget, capped by what is left of the request once
+    `llm_reserve` seconds are kept for the LLM retrieval. A stage stopped short records itself,
+    the request then has more results than it gives back (see `has_more`)
+    """
+
+    def __init__(
+        self,
+        seconds: float,
+        stage_seconds: Dict[str, float] | None = None,
+        llm_reserve: float = 0.0,
+    ):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.stage_seconds = stage_seconds or {}
+        self.llm_reserve = llm_reserve
+        self.cut_stages: List[str] = []
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, stage: str) -> float:
+        """
+        Seconds the stage may run from now
+        """
+        available = self.remaining()
+        if stage != "retrieval":
+            available -= self.llm_reserve
+        return max(min(self.stage_seconds.get(stage, available), available), 0.0)
+
+    def cut(self, stage: str):
+        """
+        Record a stage stopped by its budget, its results are partial
+        """
+        if stage not in self.cut_stages:
+            self.cut_stages.append(stage)
+        log.warning(f"Deadline: {stage} stopped short, {self.remaining():.2f}s left of {self.seconds}s")
+
+    @property
+    def has_more(self) -> bool:
+        return len(self.cut_stages) > 0
+
+    def report(self) -> dict:
+        return {
+            "seconds": self.seconds,
+            "remaining": round(self.remaining(), 2),
+            "cut_stages": self.cut_stages,
+        }
+
+
+def request_deadline(seconds: float | None = None) -> Deadline:
+    """
+    Deadline of a new request, `seconds` (the `deadline` query param) can only shorten
+    the configured request budget
+    """
+    budget = config.get_request_deadline()
+    if seconds is not None and seconds > 0:
+        budget = min(seconds, budget)
+    return Deadline(
+        budget,
+        stage_seconds=config.get_stage_deadlines(),
+        llm_reserve=config.get_llm_reserve_seconds(),
+    )
+
+
+async def gather_within(aws: Iterable[Awaitable], timeout: float | None) -> Tuple[list, bool]:
+    """
+    asyncio.gather(*aws, return_exceptions=True) giving up after `timeout` seconds : the jobs
+    still running are cancelled and give a TimeoutError. Also tells whether a job timed out
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    if not tasks:
+        return [], False
+    try:
+        _done, pending = await asyncio.wait(tasks, timeout=timeout)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = []
+    for task in tasks:
+        if task in pending or task.cancelled():
+            results.append(TimeoutError())
+        elif task.exception() is not None:
+            results.append(task.exception())
+        else:
+            results.append(task.result())
+    return results, len(pending) > 0
@@ -0,0 +1,163 @@
+import os
+import gzip
+import json
+import time
+import queue
+import shutil
+import hashlib
+import threading
+import logging as log
+from typing import Any, Callable, List
+
+from src.config import Config
+from src.tracing import get_request_id
+
+config = Config()
+
+PRUNE_EVERY = 50
+
+
+class ArtifactSink:
+    """
+    Debug dumps (search API responses, scraped docs, splits, responses) written by a background
+    thread, so the request path only pays for the JSON encoding.
+
+    The files go to `root/<request id>/<ms timestamp>-<name>.json[.gz]`, only the newest
+    `max_requests` request folders are kept. Whole requests are sampled (`sample_rate`) and
+    only the `artifacts` names are dumped ("all" for every name)
+    """
+
+    def __init__(
+        self,
+        root: str,
+        enabled: bool = True,
+        artifacts: List[str] | str = "all",
+        sample_rate: float = 1.0,
+        compress: bool = True,
+        max_requests: int = 200,
+        queue_size: int = 1000,
+    ):
+        self.root = root
+        self.enabled = enabled
+        self.artifacts = artifacts
+        self.sample_rate = sample_rate
+        self.compress = compress
+        self.max_requests = max_requests
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def wants(self, name: str) -> bool:
+        """
+        Whether a dump of `name` in the current request would be written
+        """
+        if not self.enabled:
+            return False
+        if self.artifacts != "all" and name not in self.artifacts:
+            return False
+        return self._sampled(get_request_id())
+
+    def dump(self, name: str, data: Any | Callable[[], Any], indent: int | None = None):
+        """
+        Queue a dump of `data` (or of what the `data` callable gives) for the current request,
+        strings are written as they are. Dropped when the writer is behind
+        """
+        if not self.wants(name):
+            return
+        if callable(data):
+            data = data()
+        content = data if isinstance(data, str) else json.dumps(data, indent=indent, default=str)
+
+        request_id = get_request_id()
+        folder = os.path.join(self.root, request_id if request_id != "-" else "no-request")
+        file_name = f"{int(time.time() * 1000)}-{name}.json{'.gz' if self.compress else ''}"
+        self._start()
+        try:
+            self.queue.put_nowait((os.path.join(folder, file_name), content))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0):
+        """
+        Write the queued dumps and stop the writer thread
+        """
+        if self._thread is None:
+            return
+        self.queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    def _sampled(self, request_id: str) -> bool:
+        """
+        Same decision for every dump of a request
+        """
+        if self.sample_rate >= 1:
+            return True
+        digest = hashlib.sha1(request_id.encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "big") / 2**32 < self.sample_rate
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="debug-artifacts", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self._prune()
+                break
+            path, content = item
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.compress:
+                    with gzip.open(path, "wt", encoding="utf-8") as f:
+                        f.write(content)
+                else:
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(content)
+                self.written += 1
+            except Exception as e:
+                log.error(f"Debug artifact write failed for {path}: {e}")
+                continue
+            if self.written % PRUNE_EVERY == 0:
+                self._prune()
+
+    def _prune(self):
+        """
+        Remove the oldest request folders beyond `max_requests`
+        """
+        try:
+            folders = [entry for entry in os.scandir(self.root) if entry.is_dir()]
+        except FileNotFoundError:
+            return
+        if len(folders) <= self.max_requests:
+            return
+        folders.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in folders[: len(folders) - self.max_requests]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+debug_artifacts = ArtifactSink(
+    root=config.get_debug_artifacts_path(),
+    enabled=config.get_debug_artifacts_enabled(),
+    artifacts=config.get_debug_artifact_names(),
+    sample_rate=config.get_debug_artifacts_sample_rate(),
+    compress=config.get_debug_artifacts_compress(),
+    max_requests=config.get_debug_artifacts_max_requests(),
+)
@@ -0,0 +1,184 @@
+import re
+import time
+import logging as log
+from typing import Dict, Tuple
+import httpx
+
+from src.config import Config
+from src.preprocessPool import preprocess_doc_async
+
+config = Config()
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+
+# Markers of pages that render their content with javascript
+SPA_MARKERS = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>'
+    r"|ng-version=|data-reactroot|window\.__INITIAL_STATE__"
+    r"|enable javascript to run this app|you need to enable javascript",
+    re.IGNORECASE,
+)
+
+
+class TierStats:
+    """
+    Hit rate and latency counters of a fetch tier
+    """
+
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, hit: bool, elapsed: float):
+        self.attempts += 1
+        self.hits += int(hit)
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def snapshot(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.attempts, 3) if self.attempts else 0.0,
+            "avg_latency": (
+                round(self.total_time / self.attempts, 3) if self.attempts else 0.0
+            ),
+            "max_latency": round(self.max_time, 3),
+        }
+
+
+fetch_stats: Dict[str, TierStats] = {"http": TierStats(), "chromium": TierStats()}
+
+
+def get_fetch_stats() -> dict:
+    return {tier: stats.snapshot() for tier, stats in fetch_stats.items()}
+
+
+def cache_validators(headers) -> dict:
+    """
+    ETag and Last-Modified of a response, for revalidating the cached page
+    """
+    return {
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified"),
+    }
+
+
+class HttpFetcher:
+    """
+    First scraping tier, a pooled keep-alive HTTP/2 client for the static pages.
+    Returns None when the page has to be rendered in Chromium
+    """
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        max_connections: int = 100,
+        min_text_length: int = 500,
+        max_bytes: int = 3 * 1024 * 1024,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.min_text_length = min_text_length
+        self.max_bytes = max_bytes
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                follow_redirects=True,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections // 2,
+                ),
+                headers={
+                    "User-Agent": USER_AGENT,
+                    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+                    "Accept-Language": "en-US,en;q=0.9",
+                },
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, url: str) -> Tuple[str | None, dict]:
+        """
+        Fetch the url over plain HTTP and return the preprocessed text with the cache validators,
+        the text is None if the page looks javascript rendered or the request fails
+        """
+        t_start = time.time()
+        processed_web_content = None
+        validators = {}
+        try:
+            response = await self.client.get(url)
+            html = self.static_html(url, response)
+            if html is not None:
+                processed_web_content = await self.static_content(url, html)
+                validators = cache_validators(response.headers)
+        except Exception as e:
+            log.debug(f"HTTP fetch failed for {url}: {e}")
+
+        t_end = time.time()
+        fetch_stats["http"].record(processed_web_content is not None, t_end - t_start)
+        if processed_web_content is not None:
+            log.info(f"Content fetched over HTTP for {url} in {(t_end - t_start):.2f} seconds")
+        return processed_web_content, validators
+
+    async def revalidate(
+        self, url: str, etag: str | None, last_modified: str | None
+    ) -> bool:
+        """
+        Conditional GET of a cached page, True if the server answers 304 Not Modified
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        try:
+            response = await self.client.get(url, headers=headers)
+        except Exception as e:
+            log.debug(f"Revalidation failed for {url}: {e}")
+            return False
+        return response.status_code == 304
+
+    def static_html(self, url: str, response: httpx.Response) -> str | None:
+        if response.status_code >= 400:
+            log.debug(f"HTTP fetch of {url} returned {response.status_code}, escalating")
+            return None
+        content_type = response.headers.get("content-type", "")
+        if "html" not in content_type:
+            log.debug(f"HTTP fetch of {url} is not html ({content_type}), escalating")
+            return None
+        if len(response.content) > self.max_bytes:
+            log.debug(f"HTTP fetch of {url} is too large, escalating")
+            return None
+        html = response.text
+        if SPA_MARKERS.search(html):
+            log.debug(f"HTTP fetch of {url} looks javascript rendered, escalating")
+            return None
+        return html
+
+    async def static_content(self, url: str, html: str) -> str | None:
+        processed_web_content = await preprocess_doc_async(html)
+        if len(processed_web_content) < self.min_text_length:
+            log.debug(
+                f"HTTP fetch of {url} has too little text ({len(processed_web_content)}), escalating"
+            )
+            return None
+        return processed_web_content
+
+
+http_fetcher = HttpFetcher(
+    timeout=config.get_http_fetch_timeout(),
+    max_connections=config.get_http_fetch_max_connections(),
+    min_text_length=config.get_http_fetch_min_text_length(),
+)
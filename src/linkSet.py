@@ -0,0 +1,117 @@
+from typing import Callable, Dict, Iterable, Iterator, List
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from src.model import Link
+
+TRACKING_PARAMS = {
+    "gclid",
+    "fbclid",
+    "msclkid",
+    "dclid",
+    "yclid",
+    "mc_cid",
+    "mc_eid",
+    "_ga",
+    "_gl",
+    "ref",
+    "ref_src",
+    "srsltid",
+}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize the url for comparing and hashing, ignores the scheme, `www.`, default ports,
+    trailing slash, fragment and the tracking params (utm_*, gclid etc.)
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip().lower()
+
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path.rstrip("/")
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    query.sort()
+
+    normalized = f"{host}{path}"
+    if query:
+        normalized = f"{normalized}?{urlencode(query)}"
+    return normalized
+
+
+# filled on the kept link from a duplicate (a Google Maps hit of a web result)
+MERGED_FIELDS = ("latitude", "longitude", "rating", "rating_count", "phone")
+
+
+def link_key(link: Link) -> str:
+    return normalize_url(link.link)
+
+
+class LinkSet:
+    """
+    Insertion ordered set of links, unique on the normalized url (see normalize_url),
+    or on `key`. A duplicate adds its sources to the kept link and fills its missing Maps fields
+    """
+
+    def __init__(
+        self, links: Iterable[Link] | None = None, key: Callable[[Link], str] = link_key
+    ):
+        self.key = key
+        self._links: Dict[str, Link] = {}
+        if links is not None:
+            self.update(links)
+
+    def add(self, link: Link) -> bool:
+        """
+        Add the link, False when it was already in the set
+        """
+        link_id = self.key(link)
+        kept = self._links.get(link_id)
+        if kept is None:
+            self._links[link_id] = link
+            return True
+        if kept is not link:
+            for source in link.source or []:
+                kept.addSource(source)
+            for field in MERGED_FIELDS:
+                if getattr(kept, field) is None and getattr(link, field) is not None:
+                    setattr(kept, field, getattr(link, field))
+        return False
+
+    def update(self, links: Iterable[Link]):
+        for link in links:
+            if isinstance(link, Link):
+                self.add(link)
+
+    def get(self, link: Link | str) -> Link | None:
+        """
+        The kept link of `link` (a Link or a url)
+        """
+        return self._links.get(self._key_of(link))
+
+    def _key_of(self, link: Link | str) -> str:
+        if isinstance(link, Link):
+            return self.key(link)
+        return self.key(Link(title="", link=link, source=[]))
+
+    def __contains__(self, link: Link | str) -> bool:
+        return self._key_of(link) in self._links
+
+    def __len__(self) -> int:
+        return len(self._links)
+
+    def __iter__(self) -> Iterator[Link]:
+        return iter(self._links.values())
+
+    def to_list(self) -> List[Link]:
+        return list(self._links.values())
@@ -0,0 +1,134 @@
+import os
+import asyncio
+import logging as log
+from typing import Dict
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from dotenv import load_dotenv
+
+from src.config import Config
+from src.metrics import timed_llm_call
+
+load_dotenv()
+
+config = Config()
+
+_http_client: httpx.AsyncClient | None = None
+_llm_clients: Dict[str, "LLMClient"] = {}
+
+
+def _shared_http_client() -> httpx.AsyncClient:
+    """
+    One keep-alive (HTTP/2) connection pool to the OpenAI API shared by all the models
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        max_connections = config.get_llm_max_connections()
+        _http_client = DefaultAsyncHttpxClient(
+            http2=config.get_llm_http2(),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60,
+            ),
+        )
+    return _http_client
+
+
+class LLMClient:
+    """
+    AsyncOpenAI client of one model, at most `max_concurrency` requests in flight per worker
+    """
+
+    def __init__(self, model: str, timeout: float, max_retries: int, max_concurrency: int):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=timeout,
+            max_retries=max_retries,
+            http_client=_shared_http_client(),
+        )
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def chat(self, max_retries: int | None = None, **kwargs):
+        """
+        chat.completions.create on the model, waits for a free slot first
+        """
+        client = self.client
+        if max_retries is not None:
+            client = client.with_options(max_retries=max_retries)
+
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        self.requests += 1
+        try:
+            with timed_llm_call(self.model):
+                return await client.chat.completions.create(model=self.model, **kwargs)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+def get_llm_client(model: str) -> LLMClient:
+    """
+    Shared client of the model, created on first use
+    """
+    llm_client = _llm_clients.get(model)
+    if llm_client is None:
+        llm_client = _llm_clients[model] = LLMClient(
+            model,
+            timeout=config.get_llm_timeout(model),
+            max_retries=config.get_llm_retries(),
+            max_concurrency=config.get_llm_max_concurrency(model),
+        )
+    return llm_client
+
+
+def start_llm_clients(models: list | None = None):
+    """
+    Open the shared connection pool and the clients of the models at app startup
+    """
+    if os.getenv("OPENAI_API_KEY") is None:
+        log.error(f"No Open API key found, LLM clients not started")
+        return
+    _shared_http_client()
+    for model in models or []:
+        get_llm_client(model)
+    log.info(f"LLM clients started: {list(_llm_clients)}")
+
+
+async def close_llm_clients():
+    global _http_client
+    _llm_clients.clear()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    log.info("LLM clients closed")
+
+
+def get_llm_stats() -> dict:
+    return {model: llm_client.stats() for model, llm_client in _llm_clients.items()}
@@ -1,30 +1,23 @@
-import os
 import time
 import logging as log
-from openai import OpenAI
 import json
-from dotenv import load_dotenv
 
-load_dotenv()
-
-MY_ENV_VAR = os.getenv("OPENAI_API_KEY")
+from src.llmClients import get_llm_client
 
 System_Prompt_title_gen = 'Give an appropriate title (just as a summary) for the given goal(not more than 8-9 words). Make it like in third person. Respond with the title in JSON format. Also assign tags to the goal (like- "Higher Education", "Car Rental" etc). Give tags (max 4 & min 2) in a list. Format- {"title":" ", "tags":[" "," "]}'
 
 
-def generate_title(goal: str):
+async def generate_title(goal: str):
     """
     Generates questions based on the user's goal or task
     """
     start_time = time.time()
-    client = OpenAI(api_key=MY_ENV_VAR)
 
     if goal is None or goal == "":
         raise ValueError("Goal is None")
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = await get_llm_client("gpt-3.5-turbo").chat(
             response_format={"type": "json_object"},
             messages=[
                 {"role": "system", "content": System_Prompt_title_gen},
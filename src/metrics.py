@@ -0,0 +1,131 @@
+import time
+import asyncio
+import functools
+from typing import Callable
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+from src.tracing import start_span, end_span
+
+# seconds, from a cached lookup up to a slow scrape or LLM call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "probe_stage_seconds",
+    "Latency of the pipeline stages",
+    ["stage", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALL_SECONDS = Histogram(
+    "probe_llm_call_seconds",
+    "Latency of the LLM API calls",
+    ["model", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "probe_llm_tokens",
+    "Tokens used by the LLM calls",
+    ["model", "kind"],
+)
+LLM_COST = Counter(
+    "probe_llm_cost_dollars",
+    "Cost of the LLM calls in dollars (gpt_cost_calculator)",
+    ["model"],
+)
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class Timer:
+    """
+    Observes the elapsed time of a block or a function into a histogram, with the outcome
+    label (ok, error or cancelled). Works as a context manager (with / async with) and a decorator
+    """
+
+    def __init__(self, histogram: Histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self._starts = []
+
+    def __enter__(self):
+        self._starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self._starts.pop()
+        if exc_type is None:
+            outcome = "ok"
+        elif issubclass(exc_type, asyncio.CancelledError):
+            outcome = "cancelled"
+        else:
+            outcome = "error"
+        self.observe(elapsed, outcome)
+        return False
+
+    def observe(self, elapsed: float, outcome: str):
+        self.histogram.labels(outcome=outcome, **self.labels).observe(elapsed)
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        return self.__exit__(exc_type, exc, traceback)
+
+    def __call__(self, func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with type(self)(self.histogram, **self.labels):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with type(self)(self.histogram, **self.labels):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+class StageTimer(Timer):
+    """
+    Timer of a pipeline stage, also a tracing span of the request (see src/tracing)
+    """
+
+    def __init__(self, histogram: Histogram, **labels):
+        super().__init__(histogram, **labels)
+        self._spans = []
+
+    def __enter__(self):
+        self._spans.append(start_span(self.labels["stage"]))
+        return super().__enter__()
+
+    def observe(self, elapsed: float, outcome: str):
+        super().observe(elapsed, outcome)
+        end_span(self._spans.pop(), self.labels["stage"], elapsed, outcome)
+
+
+def timed_stage(stage: str) -> StageTimer:
+    """
+    Timer and span of a pipeline stage :
+        @timed_stage("split")  or  with timed_stage("search_google"): ...
+    """
+    return StageTimer(STAGE_SECONDS, stage=stage)
+
+
+def timed_llm_call(model: str) -> Timer:
+    return Timer(LLM_CALL_SECONDS, model=model)
+
+
+def record_llm_usage(model: str, prompt_tokens: int, completion_tokens: int, cost: float):
+    LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
+    LLM_COST.labels(model=model).inc(cost)
+
+
+def metrics_payload() -> bytes:
+    """
+    All the metrics in the Prometheus text format
+    """
+    return generate_latest()
@@ -4,6 +4,8 @@ from typing import List, Dict
 from pydantic import BaseModel
 from urllib.parse import urlparse
 
+from src.deadline import Deadline
+
 
 class ContactDetails(BaseModel):
     email: str = ""
@@ -36,6 +38,7 @@ class ApiResponse(BaseModel):
     id: str
     prompt: str
     count: int
+    has_more: bool = False
     location: str
     meta: dict
     results: List[ServiceProvider]
@@ -79,6 +82,7 @@ class Link:
         longitude: str | None = None,
         rating: str | None = None,
         rating_count: str | None = None,
+        phone: str | None = None,
     ):
         self.id = None
         self.local_index = local_index
@@ -93,6 +97,7 @@ class Link:
         self.vendor_name = None
         self.rating = rating
         self.rating_count = rating_count
+        self.phone = phone
         self.address = None
 
     def __str__(self):
@@ -120,6 +125,7 @@ class Link:
             "longitude": self.longitude,
             "rating": self.rating,
             "rating_count": self.rating_count,
+            "phone": self.phone,
         }
 
     def getJSON(self):
@@ -170,12 +176,20 @@ def check_duplicate_links(links: List[Link]) -> bool:
 
 
 class RequestContext:
-    def __init__(self, id: str, prompt: str, location: str, country_code: str):
+    def __init__(
+        self,
+        id: str,
+        prompt: str,
+        location: str,
+        country_code: str,
+        deadline: Deadline | None = None,
+    ):
         self.id = id
         self.prompt = prompt
         self.location = location
         self.country_code = country_code or "US"
         self.start_time = time.time()
+        self.deadline = deadline
         self.isProduct = False
 
         self.contacts = []
@@ -225,3 +239,9 @@ class RequestContext:
 
     def add_contacts(self, contacts):
         self.contacts.extend(contacts)
+
+    def has_more(self) -> bool:
+        """
+        Whether a stage was stopped by the request deadline, with more results left to give
+        """
+        return self.deadline is not None and self.deadline.has_more
@@ -0,0 +1,210 @@
+import os
+import time
+import zlib
+import sqlite3
+import asyncio
+import hashlib
+import logging as log
+from dataclasses import dataclass
+
+from src.config import Config
+from src.utils import normalize_url
+
+config = Config()
+
+
+@dataclass
+class CachedPage:
+    content: str
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+    fresh: bool
+
+    def has_validators(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class PageCache:
+    """
+    On-disk cache of the preprocessed page text, keyed by the hash of the normalized url.
+
+    Backed by SQLite in WAL mode so many uvicorn workers can share one cache file.
+    Entries older than `ttl` are stale and need an ETag/Last-Modified revalidation,
+    the least recently used entries are evicted once the cache grows over `max_size`
+    """
+
+    def __init__(self, path: str, ttl: int = 86400, max_size: int = 256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._ready = False
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+    async def get(self, url: str) -> CachedPage | None:
+        try:
+            cached = await asyncio.to_thread(self._get, self.cache_key(url))
+        except Exception as e:
+            log.error(f"Page cache read failed for {url}: {e}")
+            return None
+        if cached is None:
+            self.misses += 1
+        elif cached.fresh:
+            self.hits += 1
+        else:
+            self.stale += 1
+        return cached
+
+    async def put(
+        self,
+        url: str,
+        content: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ):
+        if not content:
+            return
+        try:
+            await asyncio.to_thread(
+                self._put, self.cache_key(url), url, content, etag, last_modified
+            )
+        except Exception as e:
+            log.error(f"Page cache write failed for {url}: {e}")
+
+    async def touch(self, url: str):
+        """
+        Mark the entry as fresh again, after a successful revalidation
+        """
+        self.revalidated += 1
+        try:
+            await asyncio.to_thread(self._touch, self.cache_key(url))
+        except Exception as e:
+            log.error(f"Page cache touch failed for {url}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "stale": self.stale,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        connection.execute("PRAGMA busy_timeout = 10000")
+        if not self._ready:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS pages (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    content BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )"""
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)"
+            )
+            self._ready = True
+        return connection
+
+    def _get(self, key: str) -> CachedPage | None:
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT content, etag, last_modified, fetched_at FROM pages WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            connection.execute(
+                "UPDATE pages SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        finally:
+            connection.close()
+        content, etag, last_modified, fetched_at = row
+        return CachedPage(
+            content=zlib.decompress(content).decode("utf-8"),
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=fetched_at,
+            fresh=(now - fetched_at) < self.ttl,
+        )
+
+    def _put(self, key, url, content, etag, last_modified):
+        compressed = zlib.compress(content.encode("utf-8"), 6)
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute(
+                """INSERT OR REPLACE INTO pages
+                (key, url, content, etag, last_modified, fetched_at, accessed_at, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, url, compressed, etag, last_modified, now, now, len(compressed)),
+            )
+            self._evict(connection)
+        finally:
+            connection.close()
+
+    def _touch(self, key: str):
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute(
+                "UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key),
+            )
+        finally:
+            connection.close()
+
+    def _evict(self, connection: sqlite3.Connection):
+        """
+        Delete the least recently used entries until the cache is back under 90% of max size
+        """
+        total_size_query = "SELECT COALESCE(SUM(size), 0) FROM pages"
+        if connection.execute(total_size_query).fetchone()[0] <= self.max_size:
+            return
+
+        target_size = int(self.max_size * 0.9)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            evicted = 0
+            # another worker may have evicted in the meantime
+            total_size = connection.execute(total_size_query).fetchone()[0]
+            rows = connection.execute(
+                "SELECT key, size FROM pages ORDER BY accessed_at ASC"
+            ).fetchall()
+            for key, size in rows:
+                if total_size <= target_size:
+                    break
+                connection.execute("DELETE FROM pages WHERE key = ?", (key,))
+                total_size -= size
+                evicted += 1
+            connection.execute("COMMIT")
+            log.info(f"Page cache evicted {evicted} entries")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+
+page_cache = PageCache(
+    path=config.get_page_cache_path(),
+    ttl=config.get_page_cache_ttl(),
+    max_size=config.get_page_cache_max_size(),
+)
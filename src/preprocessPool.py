@@ -0,0 +1,116 @@
+import time
+import asyncio
+import logging as log
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config import Config
+from src.data_preprocessing import preprocess_doc
+from src.metrics import timed_stage
+
+config = Config()
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def _warmup(_index: int) -> int:
+    """
+    Runs in the worker, imports the parsers and builds their state before the first page
+    """
+    preprocess_doc("<html><body><div>warmup <a href='mailto:a@b.co'>a</a></div></body></html>")
+    return multiprocessing.current_process().pid
+
+
+def start_preprocess_pool(workers: int | None = None):
+    """
+    Start the html preprocessing worker processes and warm them up
+    """
+    global _executor
+    workers = workers if workers is not None else config.get_preprocess_workers()
+    if _executor is not None or workers < 1:
+        return
+
+    t_flag1 = time.time()
+    _executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    pids = set(_executor.map(_warmup, range(workers * 2)))
+    t_flag2 = time.time()
+    log.info(
+        f"Preprocess pool started with {len(pids)} workers in {t_flag2 - t_flag1:.2f} seconds"
+    )
+
+
+def shutdown_preprocess_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+        log.info("Preprocess pool closed")
+
+
+@timed_stage("preprocess")
+async def preprocess_doc_async(html: str) -> str:
+    """
+    preprocess_doc in the worker processes, so the event loop is not blocked by the parsing.
+    Pages larger than PREPROCESS_MAX_HTML_CHARS are cut, runs inline when the pool is not started
+    """
+    max_chars = config.get_preprocess_max_html_chars()
+    if len(html) > max_chars:
+        log.warning(f"HTML of {len(html)} chars cut to {max_chars} for preprocessing")
+        html = html[:max_chars]
+
+    if _executor is None:
+        return preprocess_doc(html)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, preprocess_doc, html)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping task, a high lag means blocking work on the loop
+    """
+
+    def __init__(self, interval: float = 0.05, max_samples: int = 6000):
+        self.interval = interval
+        self.samples = deque(maxlen=max_samples)
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t_start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - t_start - self.interval
+            self.samples.append((time.time(), max(lag, 0.0)))
+
+    def report(self, since: float = 0.0) -> dict:
+        """
+        Lag stats (in ms) of the samples taken after `since` (epoch seconds)
+        """
+        lags = sorted(lag for timestamp, lag in self.samples if timestamp >= since)
+        if not lags:
+            return {"samples": 0, "avg_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "samples": len(lags),
+            "avg_ms": round(1000 * sum(lags) / len(lags), 2),
+            "p99_ms": round(1000 * lags[int(0.99 * (len(lags) - 1))], 2),
+            "max_ms": round(1000 * lags[-1], 2),
+        }
+
+
+loop_lag_monitor = LoopLagMonitor()
@@ -0,0 +1,198 @@
+import io
+import os
+import time
+import uuid
+import pstats
+import asyncio
+import cProfile
+import marshal
+import tracemalloc
+import logging as log
+from collections import OrderedDict
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import JSONResponse, Response, PlainTextResponse
+
+from src.config import Config
+from src.deadline import request_deadline
+from src.model import RequestContext
+from src.tracing import bind_request_id
+from src.app import (
+    search_query_extrapolate,
+    extract_web_context,
+    static_contacts_retrieval,
+)
+
+config = Config()
+
+# frames of the profiler itself, left out of the allocation stats
+TRACEMALLOC_FILTERS = [
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+]
+
+_snapshots: "OrderedDict[int, tracemalloc.Snapshot]" = OrderedDict()
+_snapshot_count = 0
+_profile_lock = asyncio.Lock()
+
+
+def check_admin_token(x_admin_token: str | None = Header(default=None)):
+    """
+    The profiling endpoints need the PROFILING_TOKEN env variable in the X-Admin-Token header,
+    they are all refused when it is not set
+    """
+    token = os.getenv("PROFILING_TOKEN")
+    if not token or x_admin_token != token:
+        raise HTTPException(status_code=403, detail="admin token needed!")
+
+
+router = APIRouter(prefix="/admin/profiling", dependencies=[Depends(check_admin_token)])
+
+
+def traced_memory() -> dict:
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": tracemalloc.is_tracing(),
+        "current_mb": round(current / (1024 * 1024), 3),
+        "peak_mb": round(peak / (1024 * 1024), 3),
+    }
+
+
+def format_stats(stats, top: int) -> list:
+    return [
+        {
+            "location": str(stat.traceback),
+            "size_kb": round(stat.size / 1024, 2),
+            "size_diff_kb": round(getattr(stat, "size_diff", 0) / 1024, 2),
+            "count": stat.count,
+        }
+        for stat in stats[:top]
+    ]
+
+
+@router.post("/tracemalloc/start")
+async def tracemalloc_start(frames: int | None = None) -> JSONResponse:
+    """
+    Start tracing the allocations, `frames` deep tracebacks (TRACEMALLOC_FRAMES)
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames or config.get_tracemalloc_frames())
+        log.warning(f"tracemalloc started, {tracemalloc.get_traceback_limit()} frames")
+    return JSONResponse(content=traced_memory())
+
+
+@router.post("/tracemalloc/stop")
+async def tracemalloc_stop() -> JSONResponse:
+    """
+    Stop tracing the allocations and drop the snapshots
+    """
+    memory = traced_memory()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        log.warning("tracemalloc stopped")
+    _snapshots.clear()
+    return JSONResponse(content=memory)
+
+
+@router.post("/tracemalloc/snapshot")
+async def tracemalloc_snapshot(top: int = 20, group_by: str = "lineno") -> JSONResponse:
+    """
+    Take a snapshot, gives its id (for /tracemalloc/diff) and the top allocations.
+    Only the last MAX_SNAPSHOTS snapshots are kept
+    """
+    global _snapshot_count
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="tracemalloc not started")
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by: lineno, filename or traceback")
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(TRACEMALLOC_FILTERS)
+    _snapshot_count += 1
+    _snapshots[_snapshot_count] = snapshot
+    while len(_snapshots) > config.get_max_tracemalloc_snapshots():
+        _snapshots.popitem(last=False)
+
+    response = {
+        "id": _snapshot_count,
+        "memory": traced_memory(),
+        "top": format_stats(snapshot.statistics(group_by), top),
+    }
+    return JSONResponse(content=response)
+
+
+@router.get("/tracemalloc/diff")
+async def tracemalloc_diff(
+    first: int, second: int, top: int = 20, group_by: str = "lineno"
+) -> JSONResponse:
+    """
+    Top allocation changes from snapshot `first` to snapshot `second`
+    """
+    if first not in _snapshots or second not in _snapshots:
+        raise HTTPException(
+            status_code=404, detail=f"snapshots kept: {list(_snapshots)}"
+        )
+    stats = _snapshots[second].compare_to(_snapshots[first], group_by)
+    return JSONResponse(content={"first": first, "second": second, "top": format_stats(stats, top)})
+
+
+@router.get("/static/")
+async def profile_static(
+    prompt: str | None = "",
+    location: str | None = "",
+    country_code: str | None = "US",
+    top: int = 40,
+    sort: str = "cumulative",
+    format: str = "text",
+) -> Response:
+    """
+    Run one /static/ request under cProfile. Gives the top functions (format=text),
+    or the pstats dump to open with snakeviz / pstats (format=pstats).
+    The profiler sees the whole event loop thread, run it on an otherwise idle worker
+    """
+    if prompt is None or not prompt.strip():
+        raise HTTPException(status_code=400, detail="prompt needed!")
+    if location is None or not location.strip():
+        raise HTTPException(status_code=400, detail="location needed!")
+    if format not in ("text", "pstats"):
+        raise HTTPException(status_code=400, detail="format: text or pstats")
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="a profile is already running")
+
+    ID = uuid.uuid4()
+    bind_request_id(str(ID))
+    request_context = RequestContext(
+        str(ID), prompt, location, country_code, deadline=request_deadline()
+    )
+
+    async with _profile_lock:
+        profiler = cProfile.Profile()
+        t_flag1 = time.time()
+        profiler.enable()
+        try:
+            target, query, goal_type = await search_query_extrapolate(request_context)
+            request_context.update_search_param(target, query, goal_type)
+            web_context = await extract_web_context(request_context, deep_scrape=True)
+            await static_contacts_retrieval(request_context, web_context)
+        except Exception as e:
+            log.error(f"Profiled request {ID} failed: {e}")
+        finally:
+            profiler.disable()
+        t_flag2 = time.time()
+    log.warning(f"Profiled /static/ request {ID} in {t_flag2 - t_flag1:.2f} seconds")
+
+    if format == "pstats":
+        profiler.create_stats()
+        return Response(
+            content=marshal.dumps(profiler.stats),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f"attachment; filename=static-{ID}.prof"},
+        )
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    try:
+        stats.sort_stats(sort)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"unknown sort key: {sort}")
+    stats.print_stats(top)
+    return PlainTextResponse(content=stream.getvalue())
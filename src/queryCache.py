@@ -0,0 +1,245 @@
+import re
+import copy
+import time
+import asyncio
+import hashlib
+import logging as log
+from typing import Dict, List
+
+from src.cache import LRUCache, SQLiteKV
+from src.config import Config
+
+config = Config()
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+RAW_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "for", "in", "on", "at", "to", "from", "by",
+    "with", "near", "me", "my", "i", "we", "our", "us", "is", "are", "be", "am",
+    "need", "needs", "want", "wants", "looking", "find", "get", "some", "someone",
+    "please", "can", "could", "would", "who", "which", "that", "this", "it", "any",
+}
+
+# MinHash permutations, a*x + b mod a 61 bit prime
+MINHASH_PRIME = (1 << 61) - 1
+MINHASH_PERMUTATIONS = 64
+_permutation_seeds = [
+    int.from_bytes(hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest(), "big")
+    for i in range(MINHASH_PERMUTATIONS)
+]
+MINHASH_PARAMS = [
+    ((seed >> 64) % (MINHASH_PRIME - 1) + 1, (seed & ((1 << 64) - 1)) % MINHASH_PRIME)
+    for seed in _permutation_seeds
+]
+
+
+def prompt_tokens(text: str) -> List[str]:
+    """
+    Lowercased words of the prompt without stopwords, plurals folded
+    """
+    tokens = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def entity_tokens(text: str) -> frozenset:
+    """
+    Words a similar prompt must share exactly: numbers and model names (any digit, "13", "rtx4090"),
+    brands and acronyms (capitals past the first letter, "iPhone", "HVAC", or capitalized past the first word)
+    """
+    entities = set()
+    for index, word in enumerate(RAW_WORD_PATTERN.findall(text)):
+        if (
+            any(char.isdigit() for char in word)
+            or any(char.isupper() for char in word[1:])
+            or (index > 0 and word[0].isupper())
+        ):
+            entities.update(prompt_tokens(word))
+    return frozenset(entities)
+
+
+def normalize_prompt(text: str) -> str:
+    return " ".join(sorted(set(prompt_tokens(text))))
+
+
+def normalize_location(location: str | None) -> str:
+    return " ".join(WORD_PATTERN.findall((location or "").lower()))
+
+
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+
+
+def minhash_signature(tokens: List[str]) -> List[int]:
+    """
+    MinHash of the words and their character trigrams, so that "rent" and "rental" still overlap
+    """
+    shingles = set()
+    for token in tokens:
+        shingles.add(token)
+        padded = f"#{token}#"
+        shingles.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    if not shingles:
+        return []
+    hashes = [_shingle_hash(shingle) for shingle in shingles]
+    return [min((a * h + b) % MINHASH_PRIME for h in hashes) for a, b in MINHASH_PARAMS]
+
+
+def signature_similarity(first: List[int], second: List[int]) -> float:
+    if not first or not second:
+        return 0.0
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class QueryCache:
+    """
+    Cache of generate_search_query results for a (prompt, location).
+
+    Looks up the exact prompt, then the normalized prompt (lowercased, stopwords removed, word order ignored)
+    and, when enabled, the most similar cached prompt of the same location and entities (see entity_tokens)
+    by MinHash above `threshold`.
+    Bounded in memory, optionally persisted in SQLite so the workers and restarts share it
+    """
+
+    def __init__(
+        self,
+        ttl: int = 604800,
+        maxsize: int = 1024,
+        threshold: float = 0.8,
+        similarity: bool = False,
+        store: SQLiteKV | None = None,
+    ):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.similarity = similarity
+        self.store = store
+        # normalized key -> {"prompt", "location", "result", "signature", "stored_at"}
+        self.entries = LRUCache(maxsize)
+        self.counts = {"exact": 0, "normalized": 0, "similar": 0, "miss": 0}
+        self._loaded = False
+
+    @staticmethod
+    def cache_key(prompt: str, location: str | None) -> str:
+        raw_key = f"{normalize_prompt(prompt)}|{normalize_location(location)}"
+        return hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+    async def get(self, prompt: str, location: str | None) -> dict | None:
+        """
+        Cached query generation result, None on a miss
+        """
+        key = self.cache_key(prompt, location)
+        entry = self._fresh(self.entries.get(key))
+        if entry is None and self.store is not None:
+            entry = self._fresh(await self._store_get(key))
+            if entry is not None:
+                self.entries.set(key, entry)
+
+        if entry is not None:
+            kind = "exact" if entry["prompt"] == prompt.strip() else "normalized"
+            return self._hit(kind, prompt, entry)
+
+        if self.similarity:
+            entry, score = self._most_similar(prompt, location)
+            if entry is not None and score >= self.threshold:
+                log.info(f"Query cache similarity {score:.2f} with: {entry['prompt']}")
+                return self._hit("similar", prompt, entry)
+
+        self.counts["miss"] += 1
+        log.info(f"Query cache miss, hit rate {self.hit_rate():.2f}")
+        return None
+
+    async def set(self, prompt: str, location: str | None, result: dict):
+        key = self.cache_key(prompt, location)
+        entry = {
+            "prompt": prompt.strip(),
+            "location": normalize_location(location),
+            "result": result,
+            "signature": minhash_signature(prompt_tokens(prompt)),
+            "stored_at": time.time(),
+        }
+        self.entries.set(key, entry)
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.set, key, entry, entry["stored_at"])
+            except Exception as e:
+                log.error(f"Query cache store write failed: {e}")
+
+    def hit_rate(self) -> float:
+        lookups = sum(self.counts.values())
+        return (lookups - self.counts["miss"]) / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            **self.counts,
+            "hit_rate": round(self.hit_rate(), 3),
+        }
+
+    def _hit(self, kind: str, prompt: str, entry: dict) -> dict:
+        self.counts[kind] += 1
+        log.info(f"Query cache {kind} hit for: {prompt}, hit rate {self.hit_rate():.2f}")
+        return copy.deepcopy(entry["result"])
+
+    def _fresh(self, entry: dict | None) -> dict | None:
+        if entry is None or time.time() - entry["stored_at"] > self.ttl:
+            return None
+        return entry
+
+    def _most_similar(self, prompt: str, location: str | None):
+        signature = minhash_signature(prompt_tokens(prompt))
+        entities = entity_tokens(prompt)
+        location = normalize_location(location)
+        best_entry, best_score = None, 0.0
+        for _key, entry in self.entries.items():
+            if entry["location"] != location or self._fresh(entry) is None:
+                continue
+            score = signature_similarity(signature, entry["signature"])
+            # "iphone 13" and "iphone 14" are close but not the same search
+            if score > best_score and entity_tokens(entry["prompt"]) == entities:
+                best_entry, best_score = entry, score
+        return best_entry, best_score
+
+    async def _store_get(self, key: str) -> dict | None:
+        try:
+            stored = await asyncio.to_thread(self.store.get, key)
+        except Exception as e:
+            log.error(f"Query cache store read failed: {e}")
+            return None
+        return stored[0] if stored is not None else None
+
+    async def load(self):
+        """
+        Warm the memory tier with the newest persisted entries, so similarity lookups see them too.
+        Called once at startup
+        """
+        if self._loaded or self.store is None:
+            self._loaded = True
+            return
+        self._loaded = True
+        try:
+            stored = await asyncio.to_thread(self.store.items, limit=self.entries.maxsize)
+        except Exception as e:
+            log.error(f"Query cache store load failed: {e}")
+            return
+        for key, entry, _stored_at in reversed(stored):
+            self.entries.set(key, entry)
+        log.info(f"Query cache loaded {len(stored)} entries")
+
+
+query_cache = QueryCache(
+    ttl=config.get_query_cache_ttl(),
+    maxsize=config.get_query_cache_size(),
+    threshold=config.get_query_cache_threshold(),
+    similarity=config.get_query_cache_similarity(),
+    store=(
+        SQLiteKV(config.get_query_cache_path(), table="search_queries")
+        if config.get_query_cache_persist()
+        else None
+    ),
+)
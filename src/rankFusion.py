@@ -0,0 +1,63 @@
+import heapq
+from typing import List, Tuple
+
+from src.model import Link
+from src.linkSet import LinkSet
+
+MAPS_SOURCE = "Google Maps"
+MAX_RATING = 5.0
+
+
+def maps_rating(link: Link) -> float | None:
+    """
+    Google Maps rating of the link, None when it has none ("-" from process_google_business_links)
+    """
+    if MAPS_SOURCE not in (link.source or []) or link.rating is None:
+        return None
+    try:
+        return float(link.rating)
+    except ValueError:
+        return None
+
+
+def fuse_rankings(
+    rankings: List[List[Link]],
+    top_k: int | None = None,
+    k: int = 60,
+    multi_source_boost: float = 0.25,
+    maps_rating_boost: float = 0.2,
+) -> List[Tuple[Link, float]]:
+    """
+    Reciprocal rank fusion of ranked link lists (one per provider and query).
+    A link scores sum(1 / (k + rank)) over the lists it is in (normalized url, see LinkSet),
+    times (1 + multi_source_boost) per extra source (Google, Bing, Google Maps)
+    and times (1 + maps_rating_boost * rating / 5) for the rated Google Maps places.
+    Gives the `top_k` best (link, score), best first, ties in order of first appearance
+    """
+    links = LinkSet()
+    scores = {}
+    for ranking in rankings:
+        # a page listed twice by a provider counts at its best rank
+        seen = set()
+        for rank, link in enumerate(
+            (link for link in ranking if isinstance(link, Link)), start=1
+        ):
+            links.add(link)
+            kept = id(links.get(link))
+            if kept in seen:
+                continue
+            seen.add(kept)
+            scores[kept] = scores.get(kept, 0.0) + 1 / (k + rank)
+
+    fused = []
+    for link in links:
+        score = scores[id(link)]
+        score *= 1 + multi_source_boost * max(len(set(link.source or [])) - 1, 0)
+        rating = maps_rating(link)
+        if rating is not None:
+            score *= 1 + maps_rating_boost * min(rating, MAX_RATING) / MAX_RATING
+        fused.append((link, score))
+
+    if top_k is None:
+        return sorted(fused, key=lambda item: item[1], reverse=True)
+    return heapq.nlargest(top_k, fused, key=lambda item: item[1])
@@ -1,9 +1,16 @@
 import time
-import os
 import json
+import asyncio
 import logging as log
-from openai import OpenAI
+
+from src.config import Config
+from src.llmClients import get_llm_client
 from src.utils import gpt_cost_calculator
+from src.metrics import timed_stage, record_llm_usage
+
+config = Config()
+
+QUERY_MODEL = "ft:gpt-3.5-turbo-1106:margati:querysanitation:93po9nBX"
 
 
 def checkFormat(response: dict) -> bool:
@@ -28,21 +35,16 @@ def checkFormat(response: dict) -> bool:
     return True
 
 
-def generate_search_query(prompt: str, open_api_key: str, location: str = None) -> json:
+@timed_stage("query_generation")
+async def generate_search_query(prompt: str, location: str = None) -> json:
     """
     Sanitize the search query using OpenAI for web search
+
+    Raises on timeout (QUERY_TIMEOUT) or API errors, cancelling the calling task cancels the request
     """
     t_flag1 = time.time()
 
-    if open_api_key is None:
-        try:
-            open_api_key = os.getenv("OPENAI_API_KEY")
-        except Exception as e:
-            log.error(f"No Open API key found")
-            raise e
-
     prompt = f"{prompt.strip()}"
-    client = OpenAI(api_key=open_api_key)
 
     system_prompt = """
 You are an amazing thinker and researcher. Comprehend the goal, and provide small web search queries to assist in achieving it. The queries should be based on finding the email of best individual person or an expert or service, to contact for helping or completing the user goal. First give the list of people/vendor (1 to 2, 3 if needed) to approach for the goal (Eg- UC Davis Professors, BBQ Chefs etc) in small strings as targets (focus on a person in 1-3 words). Then give search queries, always give search queries for `web` in a list of string(usually 2, 3 if needed), each targeting a person/service from the target list(searching for their email) the search query should always have location if specified by the user. Queries should be always based on specific criteria outlined by the user in their goal. `gmaps` is used for searching local businesses, including personal, small, and medium-sized enterprises, use whenever location is given, else give an empty string. The gmaps search query should also contain the location (searching for what actually user wants) along with local businesses search query. isProduct should tell if the goal is a search for a product or not. The output should be in JSON format : "{\"targets\": [\"\",\"\"], \"queries\": {\"web\": [\"\", \"\"...], \"gmaps\": \"...\"}, \"type\": (service/product)}"`
@@ -50,8 +52,8 @@ You are an amazing thinker and researcher. Comprehend the goal, and provide smal
     # 'yelp' search query should NOT include location in its query string (Yelp does not accept location based search query, only vendor).
 
     try:
-        response = client.chat.completions.create(
-            model="ft:gpt-3.5-turbo-1106:margati:querysanitation:93po9nBX",
+        response = await get_llm_client(QUERY_MODEL).chat(
+            timeout=config.get_query_llm_timeout(),
             response_format={"type": "json_object"},
             temperature=0.15,
             seed=3,
@@ -63,9 +65,12 @@ You are an amazing thinker and researcher. Comprehend the goal, and provide smal
                 },
             ],
         )
+    except asyncio.CancelledError:
+        log.warning(f"OpenAI query sanitation cancelled after {time.time() - t_flag1:.2f} seconds")
+        raise
     except Exception as e:
         log.error(f"Error in OpenAI query sanitation: {e}")
-        exit(1)
+        raise Exception("OpenAI query sanitation failed") from e
 
     t_flag2 = time.time()
     log.info(f"OpenAI Query generation time: {t_flag2 - t_flag1}\n")
@@ -77,6 +82,9 @@ You are an amazing thinker and researcher. Comprehend the goal, and provide smal
         model="gpt-3.5-turbo-finetune",
     )
     log.info(f"Cost for search query sanitation: ${cost}")
+    record_llm_usage(
+        QUERY_MODEL, response.usage.prompt_tokens, response.usage.completion_tokens, cost
+    )
     try:
         result = json.loads(response.choices[0].message.content)
         log.info(f"\nSearch Query is : {result}\n")
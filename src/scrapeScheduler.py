@@ -0,0 +1,130 @@
+import heapq
+import asyncio
+import itertools
+import logging as log
+from typing import Dict, List
+from contextlib import asynccontextmanager
+
+from src.config import Config
+from src.model import Link
+
+config = Config()
+
+
+class HostSlot:
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class ScrapeScheduler:
+    """
+    Process-wide budget of open pages shared by every request.
+
+    - at most `max_open_pages` pages are scraped at a time across all requests
+    - at most `per_host_limit` pages of the same host are scraped at a time
+    - waiting pages get a free slot in `Link.rank` order, so the top ranked pages finish first
+    """
+
+    def __init__(self, max_open_pages: int = 16, per_host_limit: int = 2):
+        self.max_open_pages = max_open_pages
+        self.per_host_limit = per_host_limit
+
+        self._available = max_open_pages
+        self._waiters: List[tuple] = []
+        self._counter = itertools.count()
+        self._hosts: Dict[str, HostSlot] = {}
+
+    @asynccontextmanager
+    async def slot(self, web_link: Link):
+        """
+        Wait for a page slot for the link, honoring the host limit and the rank priority
+        """
+        host = web_link.getDomain().lower()
+        host_slot = self._hosts.get(host)
+        if host_slot is None:
+            host_slot = self._hosts[host] = HostSlot(self.per_host_limit)
+        host_slot.users += 1
+        try:
+            async with host_slot.semaphore:
+                await self._acquire(self._priority(web_link))
+                try:
+                    yield
+                finally:
+                    self._release()
+        finally:
+            host_slot.users -= 1
+            if host_slot.users == 0:
+                self._hosts.pop(host, None)
+
+    def schedule(self, web_links: List[Link], worker) -> List[asyncio.Task]:
+        """
+        Start a task running `worker(web_link)` under the scheduler for every link, tasks keep the input order
+        """
+
+        async def scheduled(web_link: Link):
+            async with self.slot(web_link):
+                return await worker(web_link)
+
+        # tasks are created in rank order so the per host queues also favour the top ranks
+        tasks = [None] * len(web_links)
+        for index in sorted(
+            range(len(web_links)), key=lambda i: self._priority(web_links[i])
+        ):
+            tasks[index] = asyncio.ensure_future(scheduled(web_links[index]))
+        return tasks
+
+    async def run(self, web_links: List[Link], worker) -> list:
+        """
+        Run `worker(web_link)` for every link under the scheduler, results keep the input order
+        """
+        tasks = self.schedule(web_links, worker)
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "max_open_pages": self.max_open_pages,
+            "open_pages": self.max_open_pages - self._available,
+            "waiting_pages": len(self._waiters),
+            "active_hosts": len(self._hosts),
+        }
+
+    @staticmethod
+    def _priority(web_link: Link) -> float:
+        return web_link.rank if web_link.rank is not None else float("inf")
+
+    async def _acquire(self, priority: float):
+        if self._available > 0 and not self._waiters:
+            self._available -= 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._counter), waiter)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over right before the cancellation, give it back
+                self._release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def _release(self):
+        while self._waiters:
+            _priority, _count, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._available += 1
+        if self._available > self.max_open_pages:
+            log.error("Scrape scheduler released more slots than acquired")
+            self._available = self.max_open_pages
+
+
+scrape_scheduler = ScrapeScheduler(
+    max_open_pages=config.get_max_open_pages(),
+    per_host_limit=config.get_per_host_page_limit(),
+)
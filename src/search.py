@@ -1,14 +1,20 @@
 import os
 import time
 import json
-import requests
 import logging as log
 import asyncio
 from typing import Dict, List
-from itertools import zip_longest
 from dotenv import load_dotenv
 
+from src.config import Config
 from src.model import Link, getLinkJsonList
+from src.rankFusion import fuse_rankings
+from src.searchClient import get_provider_client
+from src.searchCache import search_cache
+from src.deadline import Deadline, gather_within
+from src.metrics import timed_stage
+from src.tracing import log_payload
+from src.debugArtifacts import debug_artifacts
 
 load_dotenv(override=True)
 
@@ -18,8 +24,7 @@ GOOGLE_MAPS_KEY = os.getenv("GOOGLE_MAPS_KEY")
 BING_API_KEY = os.getenv("BING_API_KEY")
 YELP_API_KEY = os.getenv("YELP_API_KEY")
 
-## --- Alert ---
-LOG_FILES = True  # Set to True to log the results to files
+config = Config()
 
 
 class Search:
@@ -30,7 +35,7 @@ class Search:
         gmaps_query: str,
         location: str,
         country_code: str,
-        timeout: int,
+        deadline: Deadline | None = None,
         web_search: bool = True,
         yelp_search: bool = True,
         gmap_search: bool = True,
@@ -40,7 +45,7 @@ class Search:
         self.gmaps_query = gmaps_query
         self.location = location
         self.country_code = country_code
-        self.timeout = timeout
+        self.deadline = deadline
         self.do_web_search = web_search
         self.do_yelp_search = yelp_search
         self.gmap_search = gmap_search
@@ -49,7 +54,7 @@ class Search:
         self, bing_search: List[Link] | None, google_search: List[Link] | None
     ) -> dict:
         """
-        This function takes the bing and google search results and returns a combined dictionary of all search links.
+        This function takes the bing and google search results and returns them fused in one ranked list (see fuse_results).
         """
 
         if not bing_search:
@@ -59,22 +64,30 @@ class Search:
             log.warning(f"No Google search results")
             return bing_search
 
-        links = {}
-        combined_results = []
-        for results in zip_longest(google_search, bing_search):
-            for i in range(2):
-                if not isinstance(results[i], Link):
-                    continue
-                source = "Google" if i == 0 else "Bing"
-                search_link = results[i].link
-                if search_link in links.keys():
-                    links[search_link].addSource(source)
-                    continue
+        return self.fuse_results([google_search, bing_search])
 
-                links[search_link] = results[i]
-                combined_results.append(results[i])
-
-        return combined_results
+    def fuse_results(
+        self, rankings: List[List[Link]], max_results: int | None = None
+    ) -> List[Link]:
+        """
+        Reciprocal rank fusion of the provider result lists, the `max_results` best links.
+        The links found by several providers or queries and the rated Google Maps places come first
+        """
+        fused = fuse_rankings(
+            rankings,
+            max_results,
+            k=config.get_rank_fusion_k(),
+            multi_source_boost=config.get_multi_source_boost(),
+            maps_rating_boost=config.get_maps_rating_boost(),
+        )
+        log_payload(
+            "Fused search results",
+            lambda: [
+                {"link": link.link, "source": link.source, "score": round(score, 6)}
+                for link, score in fused
+            ],
+        )
+        return [link for link, _ in fused]
 
     async def search_bing(
         self,
@@ -82,6 +95,24 @@ class Search:
         bing_api_key: str = None,
         country: str = "US",
         site_limit: int = 10,
+    ) -> List[Link] | None:
+        """
+        Bing search results, served from the search cache when possible
+        """
+        return await search_cache.get_or_fetch(
+            "bing",
+            f"{search_query}|{site_limit}",
+            country,
+            lambda: self._fetch_bing(search_query, bing_api_key, country, site_limit),
+        )
+
+    @timed_stage("search_bing")
+    async def _fetch_bing(
+        self,
+        search_query: str,
+        bing_api_key: str = None,
+        country: str = "US",
+        site_limit: int = 10,
     ) -> List[dict] | None:
         """
         Search the web for the query using Google.\
@@ -128,10 +159,9 @@ class Search:
         }
 
         try:
-            response = requests.get(
-                api_endpoint, params=params, headers=headers, timeout=5
+            response = await get_provider_client("bing").get(
+                api_endpoint, params=params, headers=headers
             )
-            response.raise_for_status()
         except Exception as e:
             log.error(f"Error on Bing Search request: {e}")
             return None
@@ -141,9 +171,7 @@ class Search:
         t_flag2 = time.time()
         log.debug(f"Bing search time for {search_query}: {t_flag2 - t_flag1}")
 
-        if LOG_FILES:
-            with open("src/log_data/bing.json", "w") as f:
-                json.dump(data, f)
+        debug_artifacts.dump("bing", data)
 
         if "error" not in data.keys() and "webPages" in data.keys():
             websites = [
@@ -170,6 +198,26 @@ class Search:
         google_search_engine_id: str,
         google_api_key: str = None,
         country: str = "US",
+    ) -> List[Link] | None:
+        """
+        Google search results, served from the search cache when possible
+        """
+        return await search_cache.get_or_fetch(
+            "google",
+            search_query,
+            country,
+            lambda: self._fetch_google(
+                search_query, google_search_engine_id, google_api_key, country
+            ),
+        )
+
+    @timed_stage("search_google")
+    async def _fetch_google(
+        self,
+        search_query: str,
+        google_search_engine_id: str,
+        google_api_key: str = None,
+        country: str = "US",
     ) -> List[dict] | None:
         """
         Search the web for the query using Google.\
@@ -215,9 +263,10 @@ class Search:
         params = {"q": search_query, "gl": country, "lr": "lang_en", "num": 10}
 
         try:
-            response = requests.get(api_endpoint, params=params, timeout=5)
+            response = await get_provider_client("google").get(
+                api_endpoint, params=params
+            )
             log.debug(f"Google search response code: {response.status_code}")
-            response.raise_for_status()
         except Exception as e:
             log.error(f"Error on Google Search request: {e}")
             return None
@@ -244,12 +293,11 @@ class Search:
             )
             return None
 
-        if LOG_FILES:
-            with open("src/log_data/google.json", "w") as f:
-                json.dump(data, f)
+        debug_artifacts.dump("google", data)
 
         return websites
 
+    @timed_stage("search_yelp")
     async def search_yelp(
         self,
         lat: int = None,
@@ -305,15 +353,14 @@ class Search:
         data = {}
 
         try:
-            response = requests.get(yelp_url, headers=headers, params=params)
-            response.raise_for_status()
+            response = await get_provider_client("yelp").get(
+                yelp_url, headers=headers, params=params
+            )
 
             data = response.json()
             t_flag2 = time.time()
 
-            if LOG_FILES:
-                with open("src/log_data/yelp.json", "w") as f:
-                    json.dump(data, f)
+            debug_artifacts.dump("yelp", data)
 
             data = [
                 {
@@ -355,12 +402,11 @@ class Search:
                 }
                 processed_results.append(processed_result)
 
-        if LOG_FILES:
-            with open("src/log_data/yelp_processed.json", "w") as f:
-                json.dump(processed_results, f, indent=4)
+        debug_artifacts.dump("yelp_processed", processed_results, indent=4)
         return processed_results
 
-    def yelp_reverse_search(name: str, location: str, yelp_api_key: str = None):
+    @staticmethod
+    async def yelp_reverse_search(name: str, location: str, yelp_api_key: str = None):
         # TODO : need to intigrate with the above yelp search algorithm
         """
         Takes vendor's name, location to do a reverse search on yelp
@@ -391,15 +437,14 @@ class Search:
         }
 
         try:
-            response = requests.get(yelp_url, headers=headers, params=params)
-            response.raise_for_status()
+            response = await get_provider_client("yelp").get(
+                yelp_url, headers=headers, params=params
+            )
 
             data = response.json()
             t_flag2 = time.time()
 
-            if LOG_FILES:
-                with open("src/log_data/yelp-r.json", "w") as f:
-                    json.dump(data, f)
+            debug_artifacts.dump("yelp-r", data)
 
             data = [
                 {
@@ -449,8 +494,7 @@ class Search:
             "key": GOOGLE_MAPS_KEY,
         }
         try:
-            response = requests.get(URL, params=params)
-            response.raise_for_status()
+            response = await get_provider_client("gmaps").get(URL, params=params)
         except Exception as e:
             log.error(f"Error on Google Maps Search request: {e}")
             return None
@@ -463,6 +507,20 @@ class Search:
         return results
 
     async def search_google_business(self):
+        """
+        Search for the business using Google Maps API, served from the search cache when possible
+        """
+        return await search_cache.get_or_fetch(
+            "gmaps",
+            str(self.gmaps_query),
+            self.country_code,
+            self._fetch_google_business,
+            encode=list,
+            decode=list,
+        )
+
+    @timed_stage("search_gmaps")
+    async def _fetch_google_business(self):
         """
         Search for the business using Google Maps API
         """
@@ -478,19 +536,18 @@ class Search:
         data = {"textQuery": str(self.gmaps_query)}
 
         try:
-            response = requests.post(URL, json=data, headers=headers)
-            response.raise_for_status()
+            response = await get_provider_client("gmaps").post(
+                URL, json=data, headers=headers
+            )
         except Exception as e:
             log.error(f"Error on Google Maps Search request: {e}")
             return None
         t_flag2 = time.time()
         results = response.json().get("places", [])
 
-        if LOG_FILES:
-            with open("src/log_data/google_maps.json", "w") as f:
-                json.dump(results, f, indent=4)
+        debug_artifacts.dump("google_maps", results, indent=4)
 
-        log.debug(f"Google Maps search results: {results}")
+        log_payload("Google Maps search results", lambda: results)
         log.info(
             f"\nGoogle Maps search Complete; {len(results)} items, time: {t_flag2 - t_flag1} !!\n"
         )
@@ -518,6 +575,7 @@ class Search:
                         longitude=result["location"]["longitude"],
                         rating=str(result.get("rating", "-")),
                         rating_count=str(result.get("userRatingCount", "-")),
+                        phone=result.get("internationalPhoneNumber"),
                     )
                 )
         return processed_results
@@ -554,12 +612,10 @@ class Search:
                 processed_results.append(processed_result)
         return processed_results
 
-    async def single_web_search(self, query, location, max_results=20) -> List[dict]:
+    async def provider_web_search(self, query) -> List[List[Link]]:
         """
-        Parallely search the web using Google and Bing
+        Parallely search the web using Google and Bing, gives the two ranked lists ([] when a search fails)
         """
-        log.info(f"Starting web search for : | {query} | in {location}")
-        t_flag1 = time.time()
         tasks = [
             self.search_google(
                 query, GOOGLE_SEARCH_ENGINE_ID, GOOGLE_API_KEY, self.country_code
@@ -568,16 +624,27 @@ class Search:
         ]
 
         results = await asyncio.gather(*tasks, return_exceptions=True)
-        google_results, bing_results = results
+        google_results, bing_results = [
+            result if isinstance(result, list) else [] for result in results
+        ]
 
-        log.debug(
-            f"Google search results for {query} : {getLinkJsonList(google_results)}"
+        log_payload(
+            f"Google search results for {query}", lambda: getLinkJsonList(google_results)
         )
-        log.debug(f"Bing search results for {query} : {getLinkJsonList(bing_results)}")
+        log_payload(f"Bing search results for {query}", lambda: getLinkJsonList(bing_results))
+        return [google_results, bing_results]
+
+    async def single_web_search(self, query, location, max_results=20) -> List[Link]:
+        """
+        Parallely search the web using Google and Bing
+        """
+        log.info(f"Starting web search for : | {query} | in {location}")
+        t_flag1 = time.time()
+        google_results, bing_results = await self.provider_web_search(query)
 
         # Merge the search results
         search_results = await self.web_search_ranking(bing_results, google_results)
-        log.debug(f"Web search results: {getLinkJsonList(search_results)}")
+        log_payload("Web search results", lambda: getLinkJsonList(search_results))
         search_results = search_results[:max_results]
 
         t_flag2 = time.time()
@@ -586,40 +653,18 @@ class Search:
         )
         return search_results
 
-    def gen_search_results(self, search_results, max_results: int = 15):
+    async def _gather_stage(self, stage: str, search_jobs: list) -> list:
         """
-        Generate the search results
+        Run the search jobs within the stage budget of the request deadline,
+        the jobs cut by the deadline give a TimeoutError like a failed search
         """
-        if len(search_results) == 0:
-            return []
-        if len(search_results) == 1:
-            return search_results[0][:max_results]
-
-        common_results = []
-        total = 0
-        i = 0
-
-        for results in zip_longest(*search_results):
-            for result in results:
-                if not isinstance(result, Link):
-                    continue
-                if result.link not in [r.link for r in common_results]:
-                    common_results.append(result)
-                    total += 1
-                if total >= max_results:
-                    break
-            if total >= max_results:
-                break
-
-        common_results = list(common_results[:max_results])
-        log.info(f"Common search results ready!")
-
-        # FIXME : Need to refactor this, dict to List
-        if LOG_FILES:
-            with open("src/log_data/common_search_results.json", "w") as f:
-                json.dump(getLinkJsonList(common_results), f, indent=4)
-        return common_results
+        timeout = self.deadline.budget(stage) if self.deadline is not None else None
+        search_results, timed_out = await gather_within(search_jobs, timeout)
+        if timed_out:
+            self.deadline.cut(stage)
+        return search_results
 
+    @timed_stage("secondary_search")
     async def secondary_web_search(self, docs: List[Link]) -> List[Link]:
         """
         Takes primary search docs and does a secondary search on the web based in the vendor_name in metadata
@@ -641,19 +686,23 @@ class Search:
                     self.single_web_search(search_query, self.location, max_results=3)
                 )
 
-        search_results = await asyncio.gather(*search_jobs, return_exceptions=True)
-        search_results = self.gen_search_results(search_results, max_results=20)
+        search_results = await self._gather_stage("secondary_search", search_jobs)
+        search_results = [
+            results if isinstance(results, list) else [] for results in search_results
+        ]
+        search_results = self.fuse_results(search_results, 20)
 
         t_flag2 = time.time()
         log.warning(
             f"\nSecondary Web search completed in {t_flag2 - t_flag1} seconds\n"
         )
 
-        if LOG_FILES:
-            with open("src/log_data/secondary_search_results.json", "w") as f:
-                json.dump(getLinkJsonList(search_results), f, indent=4)
+        debug_artifacts.dump(
+            "secondary_search_results", lambda: getLinkJsonList(search_results), indent=4
+        )
         return search_results
 
+    @timed_stage("search")
     async def search_web(self, max_results: int = 20, search_gmaps=False) -> List[Link]:
         """
         Parallely search multiple queries on the web
@@ -663,22 +712,42 @@ class Search:
         search_jobs = []
 
         for query in self.web_queries:
-            search_jobs.append(self.single_web_search(query, self.location))
+            search_jobs.append(self.provider_web_search(query))
 
         if search_gmaps and self.gmaps_query:
             search_jobs.append(self.search_google_business())
 
-        search_results = await asyncio.gather(*search_jobs, return_exceptions=True)
+        search_results = await self._gather_stage("search", search_jobs)
 
         if search_gmaps and self.gmaps_query:
             gmaps_results = search_results[-1]
-            if gmaps_results is not None:
+            if isinstance(gmaps_results, list):
                 gmaps_links = self.process_google_business_links(gmaps_results)
                 gmaps_links = gmaps_links[:25]
                 search_results[-1] = gmaps_links
 
-        log.debug(f"\n\nThe combined results: {getLinkJsonList(search_results)}\n")
-        search_results = self.gen_search_results(search_results, max_results)
+        # failed or timed out searches
+        search_results = [
+            results if isinstance(results, list) else [] for results in search_results
+        ]
+
+        # one ranking per provider and query, the Google Maps places last
+        rankings = [
+            ranking
+            for results in search_results[: len(self.web_queries)]
+            for ranking in results
+        ]
+        if search_gmaps and self.gmaps_query:
+            rankings.append(search_results[-1])
+
+        log_payload(
+            "The combined results",
+            lambda: [getLinkJsonList(ranking) for ranking in rankings],
+        )
+        search_results = self.fuse_results(rankings, max_results)
+        debug_artifacts.dump(
+            "common_search_results", lambda: getLinkJsonList(search_results), indent=4
+        )
 
         t_flag2 = time.time()
         log.warning(f"\nComplete Web search completed in {t_flag2 - t_flag1} seconds\n")
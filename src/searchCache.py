@@ -0,0 +1,212 @@
+import time
+import asyncio
+import hashlib
+import logging as log
+from typing import Awaitable, Callable, Dict, List
+
+from src.cache import LRUCache, SQLiteKV
+from src.config import Config
+from src.model import Link
+
+config = Config()
+
+# part of the cache key, bump it when the row layout of link_to_row changes
+ROW_VERSION = 2
+
+
+def link_to_row(link: Link) -> list:
+    """
+    Compact, JSON friendly form of a search result Link
+    """
+    return [
+        link.title,
+        link.link,
+        list(link.source),
+        link.query,
+        link.local_index,
+        link.latitude,
+        link.longitude,
+        link.rating,
+        link.rating_count,
+        link.phone,
+    ]
+
+
+def row_to_link(row: list) -> Link:
+    (
+        title,
+        link,
+        source,
+        query,
+        local_index,
+        latitude,
+        longitude,
+        rating,
+        rating_count,
+        phone,
+    ) = row
+    return Link(
+        title=title,
+        link=link,
+        source=list(source),
+        query=query,
+        local_index=local_index,
+        latitude=latitude,
+        longitude=longitude,
+        rating=rating,
+        rating_count=rating_count,
+        phone=phone,
+    )
+
+
+def encode_links(links: List[Link]) -> list:
+    return [link_to_row(link) for link in links]
+
+
+def decode_links(rows: list) -> List[Link]:
+    return [row_to_link(row) for row in rows]
+
+
+class ProviderStats:
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "hit_rate": (
+                round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0
+            ),
+        }
+
+
+class SearchCache:
+    """
+    Cache of the search provider results keyed by (provider, query, country).
+
+    Entries younger than the provider TTL are served as is, entries within the
+    stale-while-revalidate window are served and refreshed in the background.
+    An in-memory LRU sits in front of an optional SQLite tier shared by the workers
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, int],
+        stale_window: int = 3600,
+        maxsize: int = 2048,
+        store: SQLiteKV | None = None,
+    ):
+        self.ttls = ttls
+        self.stale_window = stale_window
+        self.memory = LRUCache(maxsize)
+        self.store = store
+        self.provider_stats: Dict[str, ProviderStats] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def cache_key(provider: str, query: str, country: str | None) -> str:
+        normalized_query = " ".join(str(query).lower().split())
+        raw_key = f"v{ROW_VERSION}|{provider}|{normalized_query}|{(country or '').upper()}"
+        return hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+    async def get_or_fetch(
+        self,
+        provider: str,
+        query: str,
+        country: str | None,
+        fetch: Callable[[], Awaitable[list | None]],
+        encode: Callable[[list], list] = encode_links,
+        decode: Callable[[list], list] = decode_links,
+    ) -> list | None:
+        """
+        Cached results of the provider query, `fetch` is called on a miss (None results are not cached)
+        """
+        stats = self.provider_stats.setdefault(provider, ProviderStats())
+        key = self.cache_key(provider, query, country)
+        ttl = self.ttls.get(provider, 86400)
+
+        entry = await self._lookup(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                stats.hits += 1
+                log.debug(f"Search cache hit for {provider}: {query}")
+                return decode(value)
+            if age < ttl + self.stale_window:
+                stats.stale_hits += 1
+                log.debug(f"Search cache stale hit for {provider}: {query}, refreshing")
+                self._refresh(key, provider, fetch, encode)
+                return decode(value)
+
+        stats.misses += 1
+        results = await fetch()
+        if results is not None:
+            await self._save(key, encode(results))
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.memory),
+            "providers": {
+                provider: stats.snapshot()
+                for provider, stats in self.provider_stats.items()
+            },
+        }
+
+    async def _lookup(self, key: str):
+        entry = self.memory.get(key)
+        if entry is None and self.store is not None:
+            try:
+                entry = await asyncio.to_thread(self.store.get, key)
+            except Exception as e:
+                log.error(f"Search cache store read failed: {e}")
+                entry = None
+            if entry is not None:
+                self.memory.set(key, entry)
+        return entry
+
+    async def _save(self, key: str, value: list):
+        entry = (value, time.time())
+        self.memory.set(key, entry)
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.set, key, value, entry[1])
+            except Exception as e:
+                log.error(f"Search cache store write failed: {e}")
+
+    def _refresh(self, key: str, provider: str, fetch, encode):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                results = await fetch()
+                if results is not None:
+                    await self._save(key, encode(results))
+                    self.provider_stats[provider].refreshes += 1
+            except Exception as e:
+                log.error(f"Search cache refresh failed for {provider}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+
+search_cache = SearchCache(
+    ttls=config.get_search_cache_ttls(),
+    stale_window=config.get_search_cache_stale_window(),
+    maxsize=config.get_search_cache_size(),
+    store=(
+        SQLiteKV(config.get_search_cache_path(), table="search_results")
+        if config.get_search_cache_persist()
+        else None
+    ),
+)
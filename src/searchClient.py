@@ -0,0 +1,106 @@
+import random
+import asyncio
+import logging as log
+from typing import Dict
+import httpx
+
+from src.config import Config
+
+config = Config()
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ProviderClient:
+    """
+    Keep-alive HTTP client of a search provider, with its own timeout and
+    retries with jittered exponential backoff
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        retries: int = 2,
+        backoff: float = 0.3,
+        max_connections: int = 20,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send the request, retrying on network errors, 429 and 5xx. Raises on the final failure
+        """
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response
+                if attempt >= self.retries:
+                    response.raise_for_status()
+                log.warning(
+                    f"{self.name} returned {response.status_code}, retrying ({attempt + 1}/{self.retries})"
+                )
+            except httpx.TransportError as e:
+                if attempt >= self.retries:
+                    raise
+                log.warning(
+                    f"{self.name} request failed: {e!r}, retrying ({attempt + 1}/{self.retries})"
+                )
+            # full jitter backoff
+            await asyncio.sleep(random.uniform(0, self.backoff * (2**attempt)))
+            attempt += 1
+
+
+_provider_clients: Dict[str, ProviderClient] = {}
+
+
+def get_provider_client(name: str) -> ProviderClient:
+    """
+    Shared client of the provider (google, bing, gmaps, yelp), created on first use
+    """
+    provider_client = _provider_clients.get(name)
+    if provider_client is None:
+        provider_client = _provider_clients[name] = ProviderClient(
+            name,
+            timeout=config.get_search_timeout(name),
+            retries=config.get_search_retries(),
+            backoff=config.get_search_backoff(),
+        )
+    return provider_client
+
+
+async def close_provider_clients():
+    for provider_client in _provider_clients.values():
+        await provider_client.close()
+    _provider_clients.clear()
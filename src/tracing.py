@@ -0,0 +1,205 @@
+import os
+import json
+import sys
+import queue
+import random
+import logging as log
+from contextvars import ContextVar, Token
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable
+
+from src.config import Config
+
+config = Config()
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+span_var: ContextVar[str] = ContextVar("span", default="")
+
+# attributes of every LogRecord, anything else on a record is an `extra` field
+RECORD_ATTRIBUTES = set(vars(log.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "request_id",
+    "span",
+}
+
+_listener: QueueListener | None = None
+_queue_handler: "DroppingQueueHandler | None" = None
+_payload_sample_rate = config.get_payload_sample_rate()
+
+
+def bind_request_id(request_id: str):
+    """
+    Tag the records of the current request (task) and of the tasks it starts with its id
+    """
+    request_id_var.set(request_id)
+
+
+def get_request_id() -> str:
+    return request_id_var.get()
+
+
+class ContextFilter(log.Filter):
+    """
+    Copies the request id and the current span on the record, in the logging task
+    """
+
+    def filter(self, record: log.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.span = span_var.get()
+        return True
+
+
+class JsonFormatter(log.Formatter):
+    """
+    One JSON object per line : time, level, logger, request id, span, message and the extra fields.
+    The payload field is cut to `payload_max_chars`
+    """
+
+    def __init__(self, payload_max_chars: int = 4000):
+        super().__init__()
+        self.payload_max_chars = payload_max_chars
+
+    def format(self, record: log.LogRecord) -> str:
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage().strip(),
+        }
+        if getattr(record, "span", ""):
+            entry["span"] = record.span
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+
+        payload = entry.get("payload")
+        if isinstance(payload, str) and len(payload) > self.payload_max_chars:
+            entry["payload"] = f"{payload[: self.payload_max_chars]}... ({len(payload)} chars)"
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Never blocks the caller : records are dropped (and counted) while the queue is full
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: log.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def start_logging():
+    """
+    Route the root logger through a queue to a listener thread writing JSON lines to LOG_FILE,
+    the request handlers only pay for putting the record on the queue
+    """
+    global _listener, _queue_handler, _payload_sample_rate
+    if _listener is not None:
+        return
+
+    if config.get_debug_logging():
+        level = log.DEBUG
+    elif config.get_logging():
+        level = log.INFO
+    else:
+        level = log.WARNING
+
+    log_file = config.get_log_file()
+    os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=config.get_log_max_bytes(),
+        backupCount=config.get_log_backups(),
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(JsonFormatter(config.get_payload_max_chars()))
+
+    log_queue = queue.Queue(maxsize=config.get_log_queue_size())
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(ContextFilter())
+
+    root = log.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _payload_sample_rate = config.get_payload_sample_rate()
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    log.info(f"Structured logging to {log_file}, level {log.getLevelName(level)}")
+
+
+def stop_logging():
+    """
+    Flush the queued records and stop the listener thread
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    log.getLogger().removeHandler(_queue_handler)
+    if _queue_handler.dropped:
+        # the handlers are closed by now
+        print(f"Logging queue full, {_queue_handler.dropped} records dropped", file=sys.stderr)
+    _listener = None
+    _queue_handler = None
+
+
+def log_payload(message: str, build: Callable[[], Any], level: int = log.DEBUG):
+    """
+    Log a large payload (result lists, LLM responses) as a JSON string field.
+    `build` only runs when the level is enabled and the record is sampled (PAYLOAD_SAMPLE_RATE),
+    so the unsampled calls cost a random draw
+    """
+    logger = log.getLogger()
+    if not logger.isEnabledFor(level):
+        return
+    if _payload_sample_rate < 1 and random.random() >= _payload_sample_rate:
+        return
+    payload = build()
+    if not isinstance(payload, str):
+        payload = json.dumps(payload, default=str)
+    logger.log(level, message, extra={"payload": payload}, stacklevel=2)
+
+
+def start_span(name: str) -> Token:
+    """
+    Enter a pipeline stage span, nested under the current span of the task
+    """
+    parent = span_var.get()
+    return span_var.set(f"{parent}/{name}" if parent else name)
+
+
+def end_span(token: Token, name: str, elapsed: float, outcome: str):
+    """
+    Leave the span, one record with the duration of the stage
+    """
+    span_var.reset(token)
+    log.info(
+        f"span {name} {outcome} in {1000 * elapsed:.1f} ms",
+        extra={"stage": name, "duration_ms": round(1000 * elapsed, 2), "outcome": outcome},
+    )
+
+
+def logging_stats() -> dict:
+    if _queue_handler is None:
+        return {"running": False}
+    return {
+        "running": True,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "payload_sample_rate": _payload_sample_rate,
+    }
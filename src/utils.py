@@ -5,9 +5,13 @@ import tldextract
 import random
 from typing import List, Optional
 import copy
-import re
+import functools
+import tiktoken
 
 from src.model import Link
+from src.linkSet import LinkSet, normalize_url
+from src.contactScan import find_email, find_phone
+from src.tracing import log_payload
 
 
 def create_documents(
@@ -127,29 +131,35 @@ def document2link(documents: List[Document] | Document) -> List[Link] | Link:
         return []
 
 
-def count_tokens(text: str) -> int:
-    # FIXME this is a dummy function have to impliment actual token count
+@functools.lru_cache(maxsize=None)
+def get_encoder(model: str = "gpt-3.5-turbo") -> tiktoken.Encoding:
+    """
+    tiktoken encoding of the model, built once per process
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
     """
     Count the number of tokens in the text
     """
-    return len(text.split())
+    return len(get_encoder(model).encode_ordinary(text))
 
 
 def rank_weblinks(web_links: List[Link], start_rank=1) -> List[Link]:
     """
-    Ranks the web links by adding rank field and making the list unique
+    Ranks the web links by adding rank field and making the list unique.
+    The ids follow the ranks (rank - 1), so the secondary links ranked after
+    the primary ones never share a context id with them
     """
     # make the list unique
-    unique_web_links = []
-    rank = start_rank
-    id = 0
-    for web_link in web_links:
-        if web_link.link not in [link.link for link in unique_web_links]:
-            web_link.rank = rank
-            web_link.id = id
-            id += 1
-            rank += 1
-            unique_web_links.append(web_link)
+    unique_web_links = LinkSet(web_links).to_list()
+    for index, web_link in enumerate(unique_web_links):
+        web_link.rank = start_rank + index
+        web_link.id = web_link.rank - 1
 
     return unique_web_links
 
@@ -174,9 +184,13 @@ def inflating_retrieval_results(
         if base_info is None:
             continue
 
-        base_info.pop("content", None)
-        base_info["metadata"].pop("title", None)
-        base_info["metadata"].pop("id", None)
+        # copies without the content, title and id, the context data is shared with the other calls
+        base_info = {name: value for name, value in base_info.items() if name != "content"}
+        base_info["metadata"] = {
+            name: value
+            for name, value in base_info.get("metadata", {}).items()
+            if name not in ("title", "id")
+        }
         result = {**result, **base_info}
         inflated_results.append(result)
 
@@ -249,25 +263,20 @@ def extract_domain(url):
         return None
 
 
-def links_merger(links1: Link, links2: Link):
+def links_merger(links1: List[Link], links2: List[Link]) -> List[Link]:
     """
-    Merge the two list of links
+    Merge the two list of links, one link per domain
     """
-    links = []
-    merge = []
-    for link in links1 + links2:
-        if extract_domain(link.link) not in links:
-            links.append(extract_domain(link.link))
-            merge.append(link)
-
-    return links
+    merge = LinkSet(key=lambda link: extract_domain(link.link))
+    merge.update(links1 + links2)
+    return merge.to_list()
 
 
 def process_secondary_links(docs: List[Document]):
     """
     Process the secondary links, gives the vendor name
     """
-    domains = []
+    domains = set()
     docs = document2link(docs)
     for doc in docs:
         if doc.base_link:
@@ -278,15 +287,21 @@ def process_secondary_links(docs: List[Document]):
         if domain in domains:
             continue
         doc.vendor_name = f"{domain}"
-        domains.append(domain)
+        domains.add(domain)
     return docs
 
 
-def process_results(results):
-    log.debug(f"Processing API results : {results}")
+def process_results(results, emails_check: set | None = None, sort: bool = True):
+    """
+    Normalize the LLM contacts to the API format, skipping the ones without contacts.
+    Pass the same `emails_check` set across calls to deduplicate incrementally, and `sort=False`
+    to keep the page rank instead of renumbering the batch
+    """
+    log_payload("Processing API results", lambda: results)
     # Initialize an empty list to store processed results
     processed_results = []
-    emails_check = set()
+    if emails_check is None:
+        emails_check = set()
     try:
         for result in results:
             if isinstance(result, (str)):
@@ -301,27 +316,15 @@ def process_results(results):
                 phone = ""
                 if contacts.get("email"):
                     if isinstance(contacts["email"], list):
-                        email = re.search(
-                            r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b",
-                            contacts["email"][0],
-                        )
+                        email = find_email(contacts["email"][0])
                     else:
-                        email = re.search(
-                            r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b",
-                            contacts["email"],
-                        )
+                        email = find_email(contacts["email"])
 
                 if contacts.get("phone"):
                     if isinstance(contacts["phone"], list):
-                        phone = re.search(
-                            r"\b(?:\+\d{1,3}\s?)?(?:\(\d{1,4}\)|\d{1,4})[\s.-]?\d{3,9}[\s.-]?\d{4}\b",
-                            contacts["phone"][0],
-                        )
+                        phone = find_phone(contacts["phone"][0])
                     else:
-                        phone = re.search(
-                            r"\b(?:\+\d{1,3}\s?)?(?:\(\d{1,4}\)|\d{1,4})[\s.-]?\d{3,9}[\s.-]?\d{4}\b",
-                            contacts["phone"],
-                        )
+                        phone = find_phone(contacts["phone"])
 
                 processed_result = {
                     "id": result.get("id", random.randint(30, 60)),
@@ -348,15 +351,19 @@ def process_results(results):
                 ):
                     continue
 
-                if processed_result["contacts"]["email"] in emails_check:
-                    continue
-                emails_check.add(processed_result["contacts"]["email"])
+                # phone or address only contacts have no email to deduplicate on
+                contact_email = processed_result["contacts"]["email"]
+                if contact_email:
+                    if contact_email in emails_check:
+                        continue
+                    emails_check.add(contact_email)
 
                 # Append the processed result to the list
                 processed_results.append(processed_result)
 
         # sorting
-        processed_results = sort_results(processed_results)
+        if sort:
+            processed_results = sort_results(processed_results)
 
     except Exception as e:
         log.error(f"Error processing API results : {e}")
@@ -3,54 +3,141 @@ import sys
 import json
 import time
 import logging as log
-from typing import Iterator, List
-from playwright.async_api import async_playwright
+from typing import AsyncIterator, Iterator, List, Tuple
 from langchain.docstore.document import Document
 from src.utils import document2map
 from src.config import Config
 from src.model import Link
-from src.data_preprocessing import preprocess_doc
-
-LOG_FILES = False  # Logs the data (keep it False)
+from src.preprocessPool import preprocess_doc_async
+from src.browserPool import browser_pool, BrowserPool
+from src.scrapeScheduler import scrape_scheduler, ScrapeScheduler
+from src.httpFetcher import http_fetcher, fetch_stats, get_fetch_stats, cache_validators
+from src.pageCache import page_cache
+from src.metrics import timed_stage
+from src.debugArtifacts import debug_artifacts
 
 config = Config()
 
 
 class AsyncChromiumLoader:
-    def __init__(self, web_links: List[str]):
+    def __init__(
+        self,
+        web_links: List[str],
+        pool: BrowserPool = browser_pool,
+        scheduler: ScrapeScheduler = scrape_scheduler,
+    ):
         self.web_links = web_links
+        self.pool = pool
+        self.scheduler = scheduler
 
     async def scrape_browser(self, web_links: List[Link]) -> List[Document]:
         """
-        Scrape the urls by creating async tasks for each url
+        Scrape the urls on the shared browser pool, the scheduler bounds the open pages
         """
         log.info(f"Starting scraping for {len(web_links)} sites...")
         results = []
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            scraping_tasks = [
-                self.scrape_url(browser, web_link) for web_link in web_links
-            ]
-            results = await asyncio.gather(*scraping_tasks, return_exceptions=True)
-            await browser.close()
-            log.debug(f"Browser closed")
-            size_in_bytes = sys.getsizeof(results)
-            size_in_mb = size_in_bytes / (1024 * 1024)
-            log.info(
-                f"Scraping done for {len(web_links)} sites, Size : {size_in_mb:.3f} MB"
-            )
+        results = await self.scheduler.run(web_links, self.scrape_url)
+        size_in_bytes = sys.getsizeof(results)
+        size_in_mb = size_in_bytes / (1024 * 1024)
+        log.info(
+            f"Scraping done for {len(web_links)} sites, Size : {size_in_mb:.3f} MB"
+        )
+        log.info(f"Fetch tier stats: {get_fetch_stats()}")
         return results
 
-    async def scrape_url(self, browser, web_link: Link) -> Document:
+    async def stream_browser(self, web_links: List[Link]) -> AsyncIterator[Document]:
+        """
+        Scrape the urls on the shared browser pool and yield each document as soon as it is ready.
+        Closing the generator cancels the pages still being scraped
+        """
+        log.info(f"Starting streaming scrape for {len(web_links)} sites...")
+        tasks = self.scheduler.schedule(web_links, self.scrape_url)
+        completed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    doc = await next_done
+                except Exception as e:
+                    log.error(f"Error in scraping task: {e}")
+                    continue
+                completed += 1
+                yield doc
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                log.info(
+                    f"Streaming scrape stopped after {completed} sites, {len(pending)} cancelled"
+                )
+            log.info(f"Fetch tier stats: {get_fetch_stats()}")
+
+    @timed_stage("scrape_page")
+    async def scrape_url(self, web_link: Link) -> Document:
         """
         Scrape the url and return the document, it also ignores assets
         """
-        processed_web_content = ""
         url = web_link.link
         log.info(f"Scraping {url}...")
+        processed_web_content = await self.fetch_content(url)
+        result_doc = Document(
+            page_content=processed_web_content, metadata=web_link.getDocumentMetadata()
+        )
+        return result_doc
+
+    async def fetch_content(self, url: str) -> str:
+        """
+        Preprocessed text of the url, from the page cache, the HTTP tier or Chromium in that order
+        """
+        use_cache = config.get_page_cache_enabled()
+        if use_cache:
+            cached = await page_cache.get(url)
+            if cached is not None:
+                if cached.fresh:
+                    log.info(f"Page cache hit for {url}")
+                    return cached.content
+                if cached.has_validators() and await http_fetcher.revalidate(
+                    url, cached.etag, cached.last_modified
+                ):
+                    log.info(f"Page cache revalidated for {url}")
+                    await page_cache.touch(url)
+                    return cached.content
+
+        processed_web_content = None
+        validators = {}
+        if config.get_http_fetch_enabled():
+            processed_web_content, validators = await http_fetcher.fetch(url)
+
+        if processed_web_content is None:
+            t_start = time.time()
+            processed_web_content = ""
+            try:
+                async with self.pool.context() as browser_context:
+                    processed_web_content, validators = await self.scrape_page(
+                        browser_context, url
+                    )
+            except Exception as e:
+                log.error(f"Error scraping {url}: {e}")
+            fetch_stats["chromium"].record(
+                bool(processed_web_content), time.time() - t_start
+            )
+
+        if use_cache and processed_web_content:
+            await page_cache.put(url, processed_web_content, **validators)
+        return processed_web_content
+
+    async def scrape_page(self, browser_context, url: str) -> Tuple[str, dict]:
+        """
+        Load the url in a new page of the browser context and return the preprocessed text,
+        with the cache validators of the response
+        """
+        processed_web_content = ""
+        validators = {}
         t_start = time.time()
+        page = None
         try:
-            page = await browser.new_page()
+            page = await browser_context.new_page()
             excluded_resource_types = ["stylesheet", "script", "image", "font", "media"]
 
             async def route_handler(route):
@@ -61,9 +148,11 @@ class AsyncChromiumLoader:
                     await route.continue_()
 
             await page.route("**/*", route_handler)
-            await page.goto(
+            response = await page.goto(
                 url, timeout=config.get_web_scraping_timeout(), wait_until="load"
             )
+            if response is not None:
+                validators = cache_validators(response.headers)
             web_content = await page.content()
             t_end = time.time()
 
@@ -72,18 +161,16 @@ class AsyncChromiumLoader:
             log.info(
                 f"Content scraped for {url} in {(t_end - t_start):.2f} seconds, Size : {size_in_kb:.3f} KB"
             )
-            processed_web_content = preprocess_doc(web_content)
+            processed_web_content = await preprocess_doc_async(web_content)
         except Exception as e:
             log.error(f"Error scraping {url}: {e}")
         finally:
             try:
-                await page.close()
+                if page is not None:
+                    await page.close()
             except Exception as e:
                 log.error(f"Error closing page: {e}")
-        result_doc = Document(
-            page_content=processed_web_content, metadata=web_link.getDocumentMetadata()
-        )
-        return result_doc
+        return processed_web_content, validators
 
     async def load_data(self) -> List[Document]:
         """
@@ -92,6 +179,12 @@ class AsyncChromiumLoader:
         data = await self.scrape_browser(self.web_links)
         return data
 
+    def lazy_load(self) -> AsyncIterator[Document]:
+        """
+        Load the data from the urls, yielding the documents as they finish
+        """
+        return self.stream_browser(self.web_links)
+
 
 async def scrape_with_playwright(web_links: List[Link]) -> List[dict]:
     """
@@ -102,10 +195,16 @@ async def scrape_with_playwright(web_links: List[Link]) -> List[dict]:
     docs = await loader.load_data()
     t_flag2 = time.time()
 
-    if LOG_FILES:
-        with open("src/log_data/docs.json", "w") as f:
-            json.dump(document2map(docs), f)
+    debug_artifacts.dump("docs", lambda: document2map(docs))
 
     log.info(f"AsyncChromium Web scrape time : { t_flag2 - t_flag1}")
 
     return docs
+
+
+def stream_with_playwright(web_links: List[Link]) -> AsyncIterator[Document]:
+    """
+    Scrape the websites using playwright, yielding each preprocessed document as soon as it is scraped
+    """
+    loader = AsyncChromiumLoader(web_links)
+    return loader.lazy_load()
@@ -0,0 +1,158 @@
+"""
+Compares the precompiled contact scanning of src/contactScan with the previous per call regexes
+(contains_contacts, process_results) on the scraped content of testings/data.json
+
+Run from the repo root :
+    python -m testings.benchmark_contact_scan [runs]
+"""
+
+import re
+import sys
+import json
+import time
+import statistics
+
+from src.contactScan import has_contacts, find_email, find_phone, scan_contacts
+
+SPLIT_WORDS = 300
+
+
+def legacy_contains_contacts(text: str, email_only: bool = False) -> bool:
+    email_pattern = r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b"
+    phone_pattern = r"\b(?:\+\d{1,3}\s?)?(?:\(\d{1,4}\)|\d{1,4})[\s.-]?\d{3,9}[\s.-]?\d{4}\b|\b\d{10}\b"
+
+    contains_email = bool(re.search(email_pattern, text))
+    contains_phone = bool(re.search(phone_pattern, text)) if not email_only else False
+
+    return contains_email or contains_phone
+
+
+def legacy_contact_fields(email: str, phone: str):
+    email = re.search(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b", email)
+    phone = re.search(
+        r"\b(?:\+\d{1,3}\s?)?(?:\(\d{1,4}\)|\d{1,4})[\s.-]?\d{3,9}[\s.-]?\d{4}\b", phone
+    )
+    return bool(email), bool(phone)
+
+
+def contact_fields(email: str, phone: str):
+    return find_email(email) is not None, find_phone(phone) is not None
+
+
+def legacy_contact_spans(text: str):
+    """
+    Two passes, one per regex, merged by position
+    """
+    emails = [
+        ("email", match.start(), match.end(), match.group())
+        for match in re.finditer(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b", text)
+    ]
+    phones = [
+        ("phone", match.start(), match.end(), match.group())
+        for match in re.finditer(
+            r"\b(?:\+\d{1,3}\s?)?(?:\(\d{1,4}\)|\d{1,4})[\s.-]?\d{3,9}[\s.-]?\d{4}\b|\b\d{10}\b", text
+        )
+    ]
+    matches = sorted(emails + phones, key=lambda match: match[1])
+    emails = sum(match[0] == "email" for match in matches)
+    return emails, len(matches) - emails
+
+
+def contact_spans(text: str):
+    matches = scan_contacts(text)
+    emails = sum(match.kind == "email" for match in matches)
+    return emails, len(matches) - emails
+
+
+def load_corpus(data_file: str = "testings/data.json"):
+    with open(data_file, "r") as f:
+        data = json.load(f)
+    docs = [item["content"] for item in data]
+    splits = []
+    for doc in docs:
+        words = doc.split(" ")
+        splits.extend(
+            " ".join(words[start : start + SPLIT_WORDS])
+            for start in range(0, len(words), SPLIT_WORDS)
+        )
+    return docs, splits
+
+
+def contact_values(docs):
+    """
+    Contact strings like the ones the LLM gives back, with some empty and malformed ones
+    """
+    values = []
+    for match in (match for doc in docs for match in scan_contacts(doc)):
+        if match.kind == "email":
+            values.append((match.value, ""))
+        else:
+            values.append(("", match.value))
+    values.extend([("n/a", "call us"), ("", "")] * (len(values) // 4 + 1))
+    return values
+
+
+def timed(func, items, runs: int):
+    timings = []
+    for _ in range(runs):
+        t_flag1 = time.perf_counter()
+        outputs = [func(*item) for item in items]
+        timings.append(time.perf_counter() - t_flag1)
+    return outputs, statistics.median(timings)
+
+
+def compare(label: str, legacy, current, items, runs: int):
+    legacy_outputs, legacy_time = timed(legacy, items, runs)
+    outputs, current_time = timed(current, items, runs)
+    same = sum(a == b for a, b in zip(legacy_outputs, outputs))
+    print(
+        f"{label:32} legacy {1000 * legacy_time:8.2f} ms, contactScan {1000 * current_time:8.2f} ms, "
+        f"speedup {legacy_time / current_time:5.1f}x, same result {same}/{len(items)}"
+    )
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    docs, splits = load_corpus()
+    print(f"{len(docs)} docs, {len(splits)} splits, {runs} runs\n")
+
+    compare(
+        "docs, email only",
+        legacy_contains_contacts,
+        has_contacts,
+        [(doc, True) for doc in docs],
+        runs,
+    )
+    compare(
+        "splits, email only",
+        legacy_contains_contacts,
+        has_contacts,
+        [(split, True) for split in splits],
+        runs,
+    )
+    compare(
+        "splits, email and phone",
+        legacy_contains_contacts,
+        has_contacts,
+        [(split, False) for split in splits],
+        runs,
+    )
+    compare(
+        "result contacts",
+        legacy_contact_fields,
+        contact_fields,
+        contact_values(docs),
+        runs,
+    )
+
+    compare(
+        "docs, email and phone spans",
+        legacy_contact_spans,
+        contact_spans,
+        [(doc,) for doc in docs],
+        runs,
+    )
+
+
+if __name__ == "__main__":
+    main()
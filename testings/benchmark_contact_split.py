@@ -0,0 +1,90 @@
+"""
+Compares the contact focused split of src/data_preprocessing (docs_contact_split) with the previous
+blind RecursiveCharacterTextSplitter split, both followed by the relevant_data email filter,
+on the scraped content of testings/data.json : split time, chunks and tokens sent to the LLM,
+and the emails kept in the context
+
+Run from the repo root :
+    python -m testings.benchmark_contact_split [runs]
+"""
+
+import sys
+import json
+import time
+import statistics
+import logging as log
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from src.utils import count_tokens, document2map
+from src.contactScan import scan_contacts
+from src.data_preprocessing import contains_contacts, docs_contact_split, relevant_data
+
+CHUNK_SIZE = 400
+
+
+def legacy_split(docs, chunk_size: int = CHUNK_SIZE, overlap: int = 15):
+    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        chunk_size=chunk_size, chunk_overlap=overlap
+    )
+    return relevant_data(extracted_content=document2map(splitter.split_documents(docs)))
+
+
+def contact_split(docs, chunk_size: int = CHUNK_SIZE):
+    return relevant_data(extracted_content=docs_contact_split(docs, chunk_size=chunk_size))
+
+
+def load_docs(data_file: str = "testings/data.json"):
+    with open(data_file, "r") as f:
+        data = json.load(f)
+    docs = [Document(page_content=item["content"], metadata=item["metadata"]) for item in data]
+    # process_data_docs only splits the documents with an email
+    return [doc for doc in docs if contains_contacts(doc.page_content, email_only=True)]
+
+
+def timed(func, docs, runs: int):
+    timings = []
+    for _ in range(runs):
+        t_flag1 = time.perf_counter()
+        chunks = func(docs)
+        timings.append(time.perf_counter() - t_flag1)
+    return chunks, statistics.median(timings)
+
+
+def summary(chunks):
+    tokens = sum(count_tokens(chunk["content"]) for chunk in chunks)
+    emails = {
+        match.value.lower()
+        for chunk in chunks
+        for match in scan_contacts(chunk["content"], phones=False)
+    }
+    return tokens, emails
+
+
+def main():
+    log.disable(log.INFO)
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    docs = load_docs()
+    total_tokens = sum(count_tokens(doc.page_content) for doc in docs)
+    print(f"{len(docs)} docs with emails, {total_tokens} tokens, chunk size {CHUNK_SIZE}, {runs} runs\n")
+
+    legacy_chunks, legacy_time = timed(legacy_split, docs, runs)
+    chunks, current_time = timed(contact_split, docs, runs)
+    legacy_tokens, legacy_emails = summary(legacy_chunks)
+    tokens, emails = summary(chunks)
+
+    print(f"{'':22} {'time ms':>10} {'chunks':>8} {'LLM tokens':>12} {'emails':>8}")
+    print(
+        f"{'recursive split':22} {1000 * legacy_time:10.2f} {len(legacy_chunks):8} "
+        f"{legacy_tokens:12} {len(legacy_emails):8}"
+    )
+    print(f"{'contact split':22} {1000 * current_time:10.2f} {len(chunks):8} {tokens:12} {len(emails):8}")
+    print(
+        f"\nspeedup {legacy_time / current_time:.1f}x, "
+        f"{100 * (1 - tokens / legacy_tokens):.0f}% fewer LLM tokens, "
+        f"emails missed {len(legacy_emails - emails)}, emails gained {len(emails - legacy_emails)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
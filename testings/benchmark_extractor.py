@@ -0,0 +1,122 @@
+"""
+Compares the html extraction backends of data_preprocessing.tags_cleaning (output and speed)
+
+Run from the repo root :
+    python -m testings.benchmark_extractor [fixtures_dir] [runs]
+
+Uses the saved *.html pages of fixtures_dir (default testings/html_fixtures), when there are none
+it builds vendor like pages out of the scraped content of testings/data.json
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import random
+import statistics
+from html import escape
+
+from src.data_preprocessing import tags_cleaning, HTML_EXTRACTORS
+
+UNWANTED_TAGS = ["script", "style", "noscript", "svg", "img", "input", "pre", "template"]
+TAGS_TO_EXTRACT = ["p", "li", "div", "a", "span", "tr", "article"]
+CONTACT_PATTERN = re.compile(r"\[Contact:\((.*?)\)\]")
+
+
+def load_fixtures(fixtures_dir: str) -> dict:
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.html"))):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def synthetic_fixtures(data_file: str = "testings/data.json") -> dict:
+    """
+    Wrap the scraped text in a typical vendor page layout (nav, scripts, nested blocks, contact links)
+    """
+    rand = random.Random(3)
+    with open(data_file, "r") as f:
+        data = json.load(f)
+
+    pages = {}
+    for index, item in enumerate(data):
+        words = item["content"].split(" ")
+        blocks = []
+        for start in range(0, len(words), 40):
+            text = escape(" ".join(words[start : start + 40]))
+            layout = rand.choice(["p", "li", "div", "table", "nested"])
+            if layout == "li":
+                blocks.append(f"<ul><li>{text}</li></ul>")
+            elif layout == "table":
+                blocks.append(f"<table><tr><td>{text}</td></tr></table>")
+            elif layout == "nested":
+                blocks.append(
+                    f"<div class='row'><div class='col'><span>{text}</span> <a href='/more'>more</a></div></div>"
+                )
+            else:
+                blocks.append(f"<{layout}>{text}</{layout}>")
+            if rand.random() < 0.1:
+                blocks.append(
+                    "<p>Contact <a href='mailto:info@example.com'>info@example.com</a>"
+                    " or <a href='tel:+15550100'>call us</a></p>"
+                )
+            if rand.random() < 0.1:
+                blocks.append("<script>window.dataLayer = [];</script><!-- block -->")
+        body = "\n".join(blocks)
+        pages[f"data-{index}.html"] = (
+            "<!DOCTYPE html><html><head><title>Vendor</title><style>p{margin:0}</style></head>"
+            f"<body><nav><a href='/'>Home</a></nav><main>{body}</main>"
+            "<footer><svg><text>logo</text></svg></footer></body></html>"
+        )
+    return pages
+
+
+def run_backend(backend: str, pages: dict, runs: int):
+    outputs = {}
+    timings = []
+    for _ in range(runs):
+        t_flag1 = time.perf_counter()
+        for name, html in pages.items():
+            outputs[name] = tags_cleaning(html, UNWANTED_TAGS, TAGS_TO_EXTRACT, backend)[0]
+        timings.append(time.perf_counter() - t_flag1)
+    return outputs, statistics.median(timings)
+
+
+def main():
+    fixtures_dir = sys.argv[1] if len(sys.argv) > 1 else "testings/html_fixtures"
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    pages = load_fixtures(fixtures_dir)
+    if not pages:
+        print(f"No fixtures in {fixtures_dir}, using pages built from testings/data.json")
+        pages = synthetic_fixtures()
+    size_mb = sum(len(html) for html in pages.values()) / (1024 * 1024)
+    print(f"{len(pages)} pages, {size_mb:.2f} MB, {runs} runs\n")
+
+    results = {}
+    for backend in HTML_EXTRACTORS:
+        results[backend] = run_backend(backend, pages, runs)
+        print(f"{backend:6} median time: {results[backend][1]:.3f} s")
+
+    baseline, baseline_time = results["bs4"]
+    for backend, (outputs, backend_time) in results.items():
+        if backend == "bs4":
+            continue
+        exact = sum(outputs[name] == baseline[name] for name in pages)
+        same_words = sum(outputs[name].split() == baseline[name].split() for name in pages)
+        same_contacts = sum(
+            CONTACT_PATTERN.findall(outputs[name]) == CONTACT_PATTERN.findall(baseline[name])
+            for name in pages
+        )
+        print(
+            f"\n{backend} vs bs4: speedup {baseline_time / backend_time:.1f}x, "
+            f"exact output {exact}/{len(pages)}, same words {same_words}/{len(pages)}, "
+            f"same contacts {same_contacts}/{len(pages)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Compares the LinkSet dedup of src/linkSet with the previous list scans of rank_weblinks,
+the search result merge (now fuse_rankings) and links_merger on generated search results (10k links by default),
+a third of them repeated with another scheme, `www.`, trailing slash or tracking params
+
+Run from the repo root :
+    python -m testings.benchmark_link_dedup [links] [runs]
+"""
+
+import sys
+import time
+import random
+import statistics
+from itertools import zip_longest
+
+from src.model import Link
+from src.rankFusion import fuse_rankings
+from src.utils import rank_weblinks, links_merger, extract_domain
+
+QUERIES = 5
+SOURCES = ["Google", "Bing", "Google Maps"]
+
+
+def variant(url: str, rng: random.Random) -> str:
+    """
+    The same page as another provider would give it
+    """
+    choice = rng.randrange(4)
+    if choice == 0:
+        return url.replace("https://", "http://")
+    if choice == 1:
+        return url.replace("https://", "https://www.")
+    if choice == 2:
+        return f"{url}/"
+    return f"{url}?utm_source=bing&gclid=abc{rng.randrange(1000)}"
+
+
+def generate_links(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    urls = []
+    for index in range(count):
+        if urls and rng.random() < 0.33:
+            urls.append(variant(rng.choice(urls), rng))
+        else:
+            domain = f"vendor{rng.randrange(count // 4)}.com"
+            urls.append(f"https://{domain}/page-{index}")
+    return urls
+
+
+def make_links(urls: list) -> list:
+    return [
+        Link(title=f"result {index}", link=url, source=[SOURCES[index % len(SOURCES)]])
+        for index, url in enumerate(urls)
+    ]
+
+
+def legacy_rank_weblinks(web_links, start_rank=1):
+    unique_web_links = []
+    rank = start_rank
+    id = 0
+    for web_link in web_links:
+        if web_link.link not in [link.link for link in unique_web_links]:
+            web_link.rank = rank
+            web_link.id = id
+            id += 1
+            rank += 1
+            unique_web_links.append(web_link)
+    return unique_web_links
+
+
+def legacy_gen_search_results(search_results, max_results):
+    common_results = []
+    total = 0
+    for results in zip_longest(*search_results):
+        for result in results:
+            if not isinstance(result, Link):
+                continue
+            if result.link not in [r.link for r in common_results]:
+                common_results.append(result)
+                total += 1
+            if total >= max_results:
+                break
+        if total >= max_results:
+            break
+    return common_results[:max_results]
+
+
+def fused_search_results(search_results, max_results):
+    return [link for link, _ in fuse_rankings(search_results, max_results)]
+
+
+def legacy_links_merger(links1, links2):
+    links = []
+    merge = []
+    for link in links1 + links2:
+        if extract_domain(link.link) not in links:
+            links.append(extract_domain(link.link))
+            merge.append(link)
+    return merge
+
+
+def timed(func, prepare, urls, runs: int):
+    """
+    Fresh links every run, the functions set rank / id and merge sources on them
+    """
+    timings = []
+    for _ in range(runs):
+        args = prepare(urls)
+        t_flag1 = time.perf_counter()
+        output = func(*args)
+        timings.append(time.perf_counter() - t_flag1)
+    return output, statistics.median(timings)
+
+
+def compare(label: str, legacy, current, prepare, urls: list, runs: int):
+    legacy_output, legacy_time = timed(legacy, prepare, urls, runs)
+    output, current_time = timed(current, prepare, urls, runs)
+    print(
+        f"{label:20} legacy {1000 * legacy_time:9.2f} ms ({len(legacy_output):5} kept), "
+        f"LinkSet {1000 * current_time:8.2f} ms ({len(output):5} kept), "
+        f"speedup {legacy_time / current_time:6.1f}x"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    urls = generate_links(count)
+    print(f"{count} links, {runs} runs\n")
+
+    compare(
+        "rank_weblinks",
+        legacy_rank_weblinks,
+        rank_weblinks,
+        lambda urls: (make_links(urls),),
+        urls,
+        runs,
+    )
+    compare(
+        "search results",
+        legacy_gen_search_results,
+        fused_search_results,
+        lambda urls: ([make_links(urls[start::QUERIES]) for start in range(QUERIES)], count),
+        urls,
+        runs,
+    )
+    half = count // 2
+    compare(
+        "links_merger",
+        legacy_links_merger,
+        links_merger,
+        lambda urls: (make_links(urls[:half]), make_links(urls[half:])),
+        urls,
+        runs,
+    )
+
+
+if __name__ == "__main__":
+    main()
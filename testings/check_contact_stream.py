@@ -0,0 +1,121 @@
+"""
+Regression check of the streamed contact retrieval (retrieval_multithreading) with a mocked LLM :
+pages split in several chunks, one of them already in the contact cache and the others sent
+to the LLM, and a secondary page ranked after them.
+
+Every page must get the contacts of all its chunks, the context data must be left untouched
+and each chunk must be cached with its own contacts only.
+
+Run from the repo root :
+    python -m testings.check_contact_stream
+"""
+
+import copy
+import asyncio
+
+import src.contactRetrieval as contact_retrieval
+from src.contactCache import ContactCache
+
+TARGETS = ["Plumbers"]
+
+
+def make_chunk(page_id: int, link: str, window: int) -> dict:
+    email = f"w{window}@{link.split('//')[1]}"
+    return {
+        "metadata": {"id": page_id, "title": link, "link": link, "source": ["Google"]},
+        "content": f"Window {window} of {link}, write to {email} for a quote",
+    }
+
+
+def make_context() -> list:
+    """
+    Two primary pages of two windows and a secondary page
+    """
+    return [
+        make_chunk(0, "https://alpha.com", 0),
+        make_chunk(0, "https://alpha.com", 1),
+        make_chunk(1, "https://beta.com", 0),
+        make_chunk(1, "https://beta.com", 1),
+        make_chunk(2, "https://gamma.com", 0),
+    ]
+
+
+def contact_email(content: str) -> str:
+    return next(word for word in content.split() if "@" in word)
+
+
+def chunk_contact(name: str, content: str) -> dict:
+    return {
+        "name": name,
+        "target": TARGETS[0],
+        "contacts": {"email": contact_email(content), "phone": ""},
+    }
+
+
+async def mocked_llm(thread_id, data, prompt, targets, llm_client, usage=None) -> dict:
+    """
+    One contact per chunk of the call, with the id the LLM is given
+    """
+    await asyncio.sleep(0.01 * thread_id)
+    return {
+        "results": [
+            {"id": chunk["id"], **chunk_contact(f"llm {chunk['title']}", chunk["content"])}
+            for chunk in data
+        ]
+    }
+
+
+async def run_stream(data: list) -> list:
+    contacts = []
+    async for batch in contact_retrieval.retrieval_multithreading(
+        data, "plumber quotes", TARGETS, max_thread=3, token_budget=800
+    ):
+        contacts.extend(batch)
+    return contacts
+
+
+async def main():
+    contact_retrieval.extract_thread_contacts = mocked_llm
+    contact_retrieval.get_llm_client = lambda model: None
+    contact_retrieval.prompt_overhead_tokens = lambda prompt, targets: 0
+    cache = ContactCache()
+    cache.use_version("check")
+    contact_retrieval.contact_cache = cache
+
+    data = make_context()
+    original = copy.deepcopy(data)
+    # the first window of the first page comes from the cache, the others from the LLM
+    cached_chunk = data[0]["content"]
+    cached_contacts = [chunk_contact("alpha", cached_chunk)]
+    await cache.set(cached_chunk, TARGETS, contact_retrieval.CONTACTS_MODEL, cached_contacts)
+    contacts = await run_stream(data)
+
+    failures = []
+    found = {contact["contacts"]["email"] for contact in contacts}
+    for chunk in original:
+        email = contact_email(chunk["content"])
+        if email not in found:
+            failures.append(f"contact lost: {email}")
+    for contact in contacts:
+        link = contact["metadata"]["link"]
+        if link.split("//")[1] not in contact["contacts"]["email"]:
+            failures.append(f"{contact['contacts']['email']} inflated with {link}")
+    if data != original:
+        failures.append("context data modified by the retrieval")
+
+    for chunk in original[1:]:
+        cached = await cache.get(chunk["content"], TARGETS, contact_retrieval.CONTACTS_MODEL)
+        emails = [contact["contacts"]["email"] for contact in cached or []]
+        if emails != [contact_email(chunk["content"])]:
+            failures.append(f"chunk of {chunk['metadata']['link']} cached with {emails}")
+
+    print(f"{len(contacts)} contacts streamed for {len(original)} chunks")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
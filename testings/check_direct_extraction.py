@@ -0,0 +1,92 @@
+"""
+Regression check of the regex first extraction (extract_direct_contacts) :
+a chunk with one site email and the phone of its Google Maps listing is extracted without the LLM,
+a chunk matching two targets equally and a chunk with an email of another domain are left for the LLM.
+
+Run from the repo root :
+    python -m testings.check_direct_extraction
+"""
+
+import src.contactExtractor as contact_extractor
+
+TARGETS = ["Plumbers", "Electricians"]
+
+
+def make_chunk(page_id: int, title: str, link: str, content: str, phone: str | None = None) -> dict:
+    return {
+        "metadata": {
+            "id": page_id,
+            "title": title,
+            "link": link,
+            "source": ["Google", "Google Maps"] if phone else ["Google"],
+            "phone": phone,
+        },
+        "content": content,
+    }
+
+
+def make_context() -> list:
+    return [
+        # one email of the site, the phone only in the Maps listing
+        make_chunk(
+            0,
+            "Acme Plumbing | Home",
+            "https://www.acmeplumbing.com/contact",
+            "Acme Plumbing, licensed plumbers for leaks and water heaters. "
+            "Write to info@acmeplumbing.com for a free quote.",
+            phone="(415) 555-0132",
+        ),
+        # plumbers and electricians as much as each other
+        make_chunk(
+            1,
+            "Bolt & Pipe - Services",
+            "https://boltandpipe.com",
+            "Bolt & Pipe has plumbers and electricians on call, "
+            "contact office@boltandpipe.com for a visit.",
+        ),
+        # the email is not on the domain of the page, nor a mailto: anchor
+        make_chunk(
+            2,
+            "Plumbers directory - Best plumbers near you",
+            "https://plumbers-directory.com/listing/42",
+            "Joe's plumbers, drains and repairs, reach joe.plumbing@gmail.com today.",
+        ),
+    ]
+
+
+def main():
+    contact_extractor.config.get_direct_extraction_enabled = lambda: True
+    data = make_context()
+    contacts, remaining_data = contact_extractor.extract_direct_contacts(data, TARGETS, "US")
+
+    failures = []
+    expected = {
+        "id": 0,
+        "name": "Acme Plumbing",
+        "target": "Plumbers",
+        "contacts": {"email": "info@acmeplumbing.com", "phone": "+14155550132"},
+    }
+    if len(contacts) != 1:
+        failures.append(f"{len(contacts)} direct contacts instead of 1: {contacts}")
+    else:
+        contact = contacts[0]
+        for key, value in expected.items():
+            if contact.get(key) != value:
+                failures.append(f"direct contact {key} is {contact.get(key)!r}, not {value!r}")
+        if "free quote" not in contact.get("info", ""):
+            failures.append(f"direct contact info without the email context: {contact.get('info')!r}")
+
+    remaining_ids = [chunk["metadata"]["id"] for chunk in remaining_data]
+    if remaining_ids != [1, 2]:
+        failures.append(f"chunks {remaining_ids} left for the LLM instead of [1, 2]")
+
+    print(f"{len(contacts)} direct contacts, {len(remaining_data)} chunks left for the LLM")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()